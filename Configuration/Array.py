@@ -2,12 +2,11 @@
 # This includes calculating distances between antennas, plotting configurations, and saving plots if needed.
 
 # Importing all the necessary modules and packages
+import csv
 import numpy as np
-import matplotlib.pyplot as plt
-from tqdm import tqdm
-
-# Set desired font style for matplotlib plots
-plt.rcParams.update({"font.family": 'serif'})                 # Use serif fonts
+from UV import baseline_vectors      # Import batched baseline calculation
+from plotting import pyplot          # Lazy import of matplotlib for the plotting functions
+from station import load_positions, position_header     # Preset loader and header row of the position files
 
 # Define system-specific variables
 paint_can_diameter = 0.183          # Paint can diameter in meters (represents the size of the antennas)
@@ -16,6 +15,20 @@ scale_factor = max_distance         # Scale factor for plotting, based on maximu
 min_distance = paint_can_diameter / max_distance  # Minimum allowable distance between antennas based on size
 
 
+'''
+baseline_lengths
+This function calculates the pairwise distances between antennas of one or many configurations in a single array operation.
+Inputs:
+    antennas: A NumPy array of shape (n_antennas, 2) or (n_configs, n_antennas, 2) with the (x, y) coordinates of the antennas.
+Outputs:
+    dist: A NumPy array of shape (n_baselines,) or (n_configs, n_baselines) with the distance of every pair (i < j).
+'''
+
+def baseline_lengths(antennas):
+    uv = baseline_vectors(antennas)
+    return np.hypot(uv[..., 0], uv[..., 1])
+
+
 '''
 calc_dist
 This function calculates the pairwise distances between antennas.
@@ -29,21 +42,13 @@ Outputs:
 def calc_dist(antennas):
     print("Calculating distances between antennas...")
 
-    dist = []           # Initialize an empty list to store distances
-    num_antennas = len(antennas)
-
-    # Loop over each pair of antennas
-    for i in range(num_antennas):
-        x1, y1 = antennas[i][0], antennas[i][1]             # Coordinates of the first antenna in the pair
-        for j in range(i+1, len(antennas)):
-            x2, y2 = antennas[j][0], antennas[j][1]         # Coordinates of the second antenna in the pair
-            # Calculate the Euclidean distance between the two antennas and append to the list
-            dist.append(np.sqrt((x1-x2)**2 + (y1 - y2)**2))
+    # Calculate the Euclidean distance of every pair of antennas at once
+    dist = baseline_lengths(antennas)
 
-    print(f"Distance calculation complete for {num_antennas} antennas.")
+    print(f"Distance calculation complete for {len(antennas)} antennas.")
 
     # Return the distances as a NumPy array
-    return np.array(dist)
+    return dist
 
 
 '''
@@ -59,6 +64,7 @@ Outputs:
 
 def plot_locations(antennas, save=False, filename=False):
     print("Plotting antenna locations...")
+    plt = pyplot()
 
     # Create a square figure for plotting the antenna locations
     plt.figure(figsize=(3, 3))
@@ -97,3 +103,77 @@ def plot_locations(antennas, save=False, filename=False):
     return
 
 
+'''
+save_positions
+This function saves antenna positions to a CSV file in the same format as the presets of the optimizer GUI
+(a header row followed by one row per antenna with its label and x and y coordinate in meters).
+Inputs:
+    antennas: A 2D NumPy array of shape (n_antennas, 2), where each row represents the (x, y) coordinates of an antenna.
+    filename: The name of the CSV file to write.
+Outputs:
+    None (The positions are written to the file).
+'''
+
+def save_positions(antennas, filename):
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(position_header)
+        for i, pos in enumerate(antennas):
+            writer.writerow([f'A{i+1}', pos[0], pos[1]])
+
+
+'''
+sample_positions
+This function draws many random antenna layouts at once that satisfy a minimum distance between the antennas.
+The antennas are placed one at a time in all layouts simultaneously: for every layout a batch of candidate
+positions is drawn and the first candidate that is far enough from the antennas already placed is accepted.
+Only the layouts in which an antenna cannot be placed are started again, instead of restarting everything.
+Inputs:
+    n_layouts: Number of layouts to draw.
+    n_antennas: Number of antennas per layout (default: 9).
+    grid_size: Size of the square ground in meters, antennas are placed within +-grid_size/2 (default: 2).
+    min_spacing: Minimum distance between two antennas in meters (default: 0.185).
+    decimals: Number of decimals the coordinates are rounded to, None for no rounding (default: 2).
+    n_candidates: Number of candidate positions drawn per layout and attempt (default: 16).
+    max_attempts: Number of attempts to place an antenna before the layout is started again (default: 20).
+    max_restarts: Number of times stuck layouts are started again before giving up (default: 100).
+    rng: Seed or NumPy random generator (default: None).
+Outputs:
+    layouts: A NumPy array of shape (n_layouts, n_antennas, 2) with the (x, y) coordinates of the antennas.
+'''
+
+def sample_positions(n_layouts, n_antennas=9, grid_size=2, min_spacing=0.185, decimals=2, n_candidates=16,
+                     max_attempts=20, max_restarts=100, rng=None):
+    rng = np.random.default_rng(rng)
+    layouts = np.zeros((n_layouts, n_antennas, 2))
+    todo = np.arange(n_layouts)             # Layouts that still have to be (re)built
+
+    for restart in range(max_restarts):
+        stuck = np.zeros(len(todo), dtype=bool)
+        for k in range(n_antennas):
+            # Layouts that still need a position for antenna k
+            pending = np.flatnonzero(~stuck)
+            for attempt in range(max_attempts):
+                candidates = rng.uniform(-grid_size/2, grid_size/2, size=(len(pending), n_candidates, 2))
+                if decimals is not None:
+                    candidates = np.round(candidates, decimals)
+
+                # Squared distances of every candidate to the antennas already placed, (layouts, candidates, k)
+                placed = layouts[todo[pending], None, :k, :]
+                ok = (((candidates[:, :, None, :] - placed)**2).sum(axis=-1) >= min_spacing**2).all(axis=-1)
+
+                found = ok.any(axis=1)
+                first = ok.argmax(axis=1)
+                layouts[todo[pending[found]], k] = candidates[found, first[found]]
+                pending = pending[~found]
+                if not pending.size:
+                    break
+
+            # Layouts without room for antenna k are started again in the next round
+            stuck[pending] = True
+
+        todo = todo[stuck]
+        if not todo.size:
+            return layouts
+
+    raise ValueError(f"Could not place {n_antennas} antennas {min_spacing} m apart on a {grid_size} m grid.")
@@ -1,14 +1,12 @@
 # This script calculates the point-spread function (PSF) of a given antenna configuration
 
-# Import necessary Python packages and modules for calculations and plotting
-from scipy import constants as const        # Import physical constants
-import matplotlib.pyplot as plt             # Plotting package for visualizations
-from astropy import units as u              # Astropy's units for handling physical units and constants
+# Import necessary Python packages and modules for calculations
+# SciPy, Astropy, TQDM and matplotlib are only imported inside the functions that use them,
+# so the fast PSF functions can be imported (e.g. by worker processes) without loading them.
 import numpy as np                          # NumPy for array manipulation and numerical operations
-from tqdm import tqdm                                 # TQDM for progress bars during calculations
+from plotting import pyplot                 # Lazy import of matplotlib for the plotting functions
 
-# Set desired font style for matplotlib plots
-plt.rcParams.update({"font.family": 'serif'})                 # Use serif fonts
+speed_of_light = 299792458.0                # Speed of light in m/s
 
 
 '''
@@ -26,6 +24,9 @@ Outputs:
 '''
 
 def pixel_brightness_faster(acm_single_pol, l, m, uv, frequency):
+    from astropy import units as u
+    from scipy import constants as const
+
     # Status update
     # print(f"Calculating pixel brightness for pixel with l={l} and m={m}...")
 
@@ -71,6 +72,9 @@ Outputs:
 
 
 def make_image(acm, num_pix, uv, frequency, l_range=(1.0, -1.0), m_range=(-1.0, 1.0)):
+    from astropy import units as u
+    from tqdm import tqdm
+
     # Status update
     print(f"Generating PSF image with {num_pix}x{num_pix} pixels...")
 
@@ -100,17 +104,209 @@ def make_image(acm, num_pix, uv, frequency, l_range=(1.0, -1.0), m_range=(-1.0,
     return img, img_extent
 
 
+'''
+iter_psf_image
+This function calculates the PSF image of a uniformly weighted array (all ones correlation matrix) block by block,
+so the caller can report progress or stop early between blocks. It gives the same image as make_image, but uses
+exp(2j*pi*(u*l + v*m)) = exp(2j*pi*u*l) * exp(2j*pi*v*m), which turns the sum over baselines into a matrix product.
+Inputs:
+    uv: UV coordinates (baseline coordinates between pairs of antennas in meters), NumPy array of shape (n_baselines, 2)
+    num_pix: Number of pixels in each dimension of the image (square image of size num_pix x num_pix)
+    frequency: Observation frequency (in Hz, float or Astropy quantity)
+    l_range: Range of l-coordinates to generate the image (default: 1 to -1)
+    m_range: Range of m-coordinates to generate the image (default: -1 to 1)
+    block_rows: Number of image rows calculated per block (default: 32)
+Outputs:
+    Generator yielding (first_row, block) with block a NumPy array of shape (rows, num_pix)
+'''
+
+def iter_psf_image(uv, num_pix, frequency, l_range=(1.0, -1.0), m_range=(-1.0, 1.0), block_rows=32):
+    # Convert frequency to Hz
+    f = frequency.to_value('Hz') if hasattr(frequency, 'unit') else float(frequency)
+
+    # Convert UV coordinates to wavelengths
+    uv_l = np.asarray(uv, dtype=np.float64) * f/speed_of_light
+    num_pix = int(num_pix)
+
+    # Phase factors of every baseline along the l and m axes
+    l_coor = np.linspace(*l_range, num_pix)
+    m_coor = np.linspace(*m_range, num_pix)
+    phase_l = np.exp(2j * np.pi * np.outer(uv_l[:, 0], l_coor)).astype(np.complex64)
+    phase_m = np.exp(2j * np.pi * np.outer(uv_l[:, 1], m_coor)).astype(np.complex64)
+
+    for start in range(0, num_pix, block_rows):
+        # Average brightness over all baselines for a block of image rows
+        yield start, (phase_m[:, start:start + block_rows].T @ phase_l).real / len(uv_l)
+
+
+'''
+psf_extent
+This function calculates the coordinate extent of a PSF image, in the same way as make_image.
+Inputs:
+    num_pix: Number of pixels in each dimension of the image
+    l_range: Range of l-coordinates of the image (default: 1 to -1)
+    m_range: Range of m-coordinates of the image (default: -1 to 1)
+Outputs:
+    img_extent: Coordinate extent of the image, used for plotting (tuple of 4 values)
+'''
+
+def psf_extent(num_pix, l_range=(1.0, -1.0), m_range=(-1.0, 1.0)):
+    half = (m_range[1] - m_range[0]) / (num_pix - 1) / 2.0
+    return (l_range[0] + half, m_range[0] - half, l_range[1] - half, m_range[1] + half)
+
+
+'''
+psf_image
+This function generates the PSF image of a uniformly weighted array in one go (see iter_psf_image).
+Inputs:
+    uv: UV coordinates (baseline coordinates between antenna pairs in meters)
+    num_pix: Number of pixels in each dimension of the image
+    frequency: Observation frequency (in Hz, float or Astropy quantity)
+    l_range: Range of l-coordinates to generate the image (default: 1 to -1)
+    m_range: Range of m-coordinates to generate the image (default: -1 to 1)
+Outputs:
+    img: Generated PSF image (2D NumPy array)
+    img_extent: Coordinate extent of the image, used for plotting (tuple of 4 values)
+'''
+
+def psf_image(uv, num_pix, frequency, l_range=(1.0, -1.0), m_range=(-1.0, 1.0)):
+    img = np.zeros((int(num_pix), int(num_pix)), dtype=np.float32)
+    for start, block in iter_psf_image(uv, num_pix, frequency, l_range, m_range):
+        img[start:start + len(block)] = block
+    return img, psf_extent(num_pix, l_range, m_range)
+
+
+'''
+ProgressivePSF
+This class keeps the PSF of a uniformly weighted array on a fixed pixel grid at several resolution levels,
+so it can follow an antenna that is being dragged. It stores the array factor F(l, m) = sum_i exp(2j*pi*(x_i*l + y_i*m)/lambda),
+from which the PSF follows as (|F|^2 - n_antennas) / (n_antennas*(n_antennas - 1)), the same image as make_image.
+    - Level 'step' is the full resolution grid sampled at every step-th pixel, so coarse levels are sub-grids of finer ones.
+    - Moving one antenna updates every cached level with a rank-one correction instead of recomputing it.
+    - A finer level is built from the next coarser cached level, only the pixels that are new are calculated.
+Inputs:
+    antennas: A 2D NumPy array of shape (n_antennas, 2) with the (x, y) coordinates of the antennas in meters
+    num_pix: Number of pixels in each dimension of the full resolution image
+    frequency: Observation frequency (in Hz, float or Astropy quantity)
+    l_range: Range of l-coordinates of the image (default: 1 to -1)
+    m_range: Range of m-coordinates of the image (default: -1 to 1)
+'''
+
+class ProgressivePSF:
+
+    def __init__(self, antennas, num_pix, frequency, l_range=(1.0, -1.0), m_range=(-1.0, 1.0)):
+        f = frequency.to_value('Hz') if hasattr(frequency, 'unit') else float(frequency)
+        self.k = 2 * np.pi * f/speed_of_light           # Phase per meter per unit direction cosine
+        self.antennas = np.array(antennas, dtype=np.float64)
+        self.num_pix = int(num_pix)
+        self.l_coor = np.linspace(*l_range, self.num_pix)
+        self.m_coor = np.linspace(*m_range, self.num_pix)
+
+        # Phase factors of every antenna along the l and m axes
+        self._phase_l = np.exp(1j * self.k * np.outer(self.antennas[:, 0], self.l_coor))
+        self._phase_m = np.exp(1j * self.k * np.outer(self.antennas[:, 1], self.m_coor))
+        self._levels = {}                               # Array factor per resolution step
+
+    '''
+    move_antenna
+    This function moves one antenna and updates all cached resolution levels with a rank-one correction.
+    Inputs:
+        index: Index of the antenna that moved
+        x, y: New coordinates of the antenna in meters
+    '''
+
+    def move_antenna(self, index, x, y):
+        old_l, old_m = self._phase_l[index].copy(), self._phase_m[index].copy()
+        self.antennas[index] = [x, y]
+        self._phase_l[index] = np.exp(1j * self.k * x * self.l_coor)
+        self._phase_m[index] = np.exp(1j * self.k * y * self.m_coor)
+
+        for step, factor in self._levels.items():
+            factor += (np.outer(self._phase_m[index, ::step], self._phase_l[index, ::step]) -
+                       np.outer(old_m[::step], old_l[::step]))
+
+    def _level(self, step):
+        if step in self._levels:
+            return self._levels[step]
+
+        phase_l, phase_m = self._phase_l[:, ::step], self._phase_m[:, ::step]
+        coarse = self._levels.get(2 * step)
+        if coarse is None:
+            factor = phase_m.T @ phase_l
+        else:
+            # Every other pixel is already known from the coarser level
+            factor = np.empty((phase_m.shape[1], phase_l.shape[1]), dtype=np.complex128)
+            factor[::2, ::2] = coarse
+            factor[1::2, :] = phase_m[:, 1::2].T @ phase_l
+            factor[::2, 1::2] = phase_m[:, ::2].T @ phase_l[:, 1::2]
+
+        self._levels[step] = factor
+        return factor
+
+    '''
+    image
+    This function returns the PSF image at a given resolution level.
+    Inputs:
+        step: Use every step-th pixel of the full resolution grid (default: 1, full resolution)
+    Outputs:
+        img: PSF image (2D NumPy array of shape (num_pix/step, num_pix/step))
+        img_extent: Coordinate extent of the image, used for plotting (tuple of 4 values)
+    '''
+
+    def image(self, step=1):
+        # Build the coarser levels first, so the finer ones can reuse their pixels
+        for coarser in sorted(s for s in (4 * step, 2 * step) if s < self.num_pix):
+            self._level(coarser)
+
+        n_ant = len(self.antennas)
+        img = ((np.abs(self._level(step))**2 - n_ant) / (n_ant * (n_ant - 1))).astype(np.float32)
+
+        l_sub, m_sub = self.l_coor[::step], self.m_coor[::step]
+        return img, psf_extent(len(m_sub), (l_sub[0], l_sub[-1]), (m_sub[0], m_sub[-1]))
+
+
+'''
+psf_lobes
+This function calculates the average PSF profile over the horizontal, vertical and both diagonal cross-sections.
+Inputs:
+    psf: The 2D PSF image (NumPy array of shape (num_pix, num_pix))
+    num_pix: Number of pixels in each dimension of the image
+Outputs:
+    l_coords: Coordinate array along the cross-sections
+    mean_cross_section: Average intensity of the four cross-sections
+'''
+
+def psf_lobes(psf, num_pix):
+    # Define l/m coordinate arrays
+    l_coords = np.linspace(-2, 2, num_pix)  # Coordinate array along l-axis
+
+    # Extract middle cross-sections (horizontal, vertical, and both diagonals)
+    y_middle = psf[:, num_pix // 2]                      # Horizontal cross-section (m=0)
+    x_middle = psf[num_pix // 2, :]                      # Vertical cross-section (l=0)
+    diag_main = np.diagonal(psf)                         # Diagonal from top-left to bottom-right
+    diag_secondary = np.diagonal(np.fliplr(psf))         # Diagonal from top-right to bottom-left
+
+    # Calculate the average cross-section intensity
+    mean_cross_section = (y_middle + x_middle + diag_main + diag_secondary) / 4
+
+    return l_coords, mean_cross_section
+
+
 '''
 subband_frequency
 This function calculates the frequency of a chosen subband in a radio interferometer.
 Inputs:
     subband_number: The index of the subband (integer, typically between 0 and 512)
-    clock_frequency: The clock frequency of the system (default: 200 MHz)
+    clock_frequency: The clock frequency of the system (default: None, meaning 200 MHz)
 Outputs:
     sb_freq: The frequency of the subband in Hz (Astropy quantity with units)
 '''
 
-def subband_frequency(subband_number, clock_frequency=200*u.MHz):
+def subband_frequency(subband_number, clock_frequency=None):
+    from astropy import units as u
+    if clock_frequency is None:
+        clock_frequency = 200*u.MHz
+
     # Status update
     print(f"Calculating frequency for subband {subband_number}...")
 
@@ -130,6 +326,9 @@ Outputs:
 '''
 
 def calc_npix():
+    from astropy import units as u
+    from scipy import constants as const
+
     # Status update
     print("Calculating the number of pixels required for PSF image...")
 
@@ -160,6 +359,7 @@ Outputs:
 def plot_psf(psf, psf_extent):
     # Status update
     print("Plotting PSF image...")
+    plt = pyplot()
 
     # Set the figure size and resolution for the PSF plot
     scale = 0.5
@@ -176,23 +376,22 @@ def plot_psf(psf, psf_extent):
     print("PSF image saved as 'psf.png'.")
 
 # Main script execution
+if __name__ == '__main__':
+    # Define the number of antennas in the array
+    n_ant = 9
 
 
-# Define the number of antennas in the array
-n_ant = 9
+    # Calculate the number of pixels needed for oversampling the PSF
+    num_pix = calc_npix()
 
+    # Define the central observation frequency (1.42 GHz for hydrogen line observations)
+    # freq = 1.42*u.GHz
 
-# Calculate the number of pixels needed for oversampling the PSF
-num_pix = calc_npix()
+    # Generate the PSF image using the make_image function
+    # psf, psf_extent = make_image(np.ones_like((n_ant, n_ant)), num_pix, uv*u.m, freq)
 
-# Define the central observation frequency (1.42 GHz for hydrogen line observations)
-# freq = 1.42*u.GHz
+    # Plot the PSF using the plot_psf function
+    # plot_psf(psf, psf_extent)
 
-# Generate the PSF image using the make_image function
-# psf, psf_extent = make_image(np.ones_like((n_ant, n_ant)), num_pix, uv*u.m, freq)
-
-# Plot the PSF using the plot_psf function
-# plot_psf(psf, psf_extent)
-
-# Status update
-print("PSF calculation and plotting completed.")
+    # Status update
+    print("PSF calculation and plotting completed.")
@@ -2,12 +2,7 @@
 
 # Importing all the needed modules and packages
 import numpy as np
-import matplotlib.pyplot as plt
-from tqdm import tqdm
-
-# Set desired font style for matplotlib plots
-plt.rcParams.update({"font.family": 'serif'})                # Use serif fonts
-
+from plotting import pyplot          # Lazy import of matplotlib for the plotting functions
 
 # Define system-specific variables
 paint_can_diameter = 0.183          # Paint can diameter in meters (representing antenna size)
@@ -17,6 +12,21 @@ scale_factor = max_distance         # Scale factor for plotting, based on maximu
 
 min_distance = paint_can_diameter / max_distance    # Minimum distance between antennas based on paint can size
 
+'''
+baseline_vectors
+This function calculates the baseline vectors of one or many antenna configurations in a single array operation.
+Baselines are ordered as pairs (i, j) with i < j (first antenna minus second antenna).
+Inputs:
+    antennas: A NumPy array of shape (n_antennas, 2) or (n_configs, n_antennas, 2) with the (x, y) coordinates of the antennas.
+Outputs:
+    uv: A NumPy array of shape (n_baselines, 2) or (n_configs, n_baselines, 2) with the (u, v) coordinates of every baseline.
+'''
+
+def baseline_vectors(antennas):
+    antennas = np.asarray(antennas, dtype=np.float64)
+    i, j = np.triu_indices(antennas.shape[-2], k=1)
+    return antennas[..., i, :] - antennas[..., j, :]
+
 '''
 u_v_space
 This function calculates the u-v coverage for a given set of antennas.
@@ -30,18 +40,10 @@ Outputs:
 def u_v_space(antennas):
     print("Calculating u-v space based on antenna configuration...")
 
-    u, v = [], []                       # Initialize lists for u and v coordinates in the u-v plane
-    num_antennas = len(antennas)
-
-    for i in range(len(antennas)):
-        x1, y1 = antennas[i][0], antennas[i][1]         # Coordinates of the first antenna in the pair
-        for j in range(i+1, len(antennas)):
-            x2, y2 = antennas[j][0], antennas[j][1]     # Coordinates of the second antenna in the pair
-            u.append((x1 - x2))         # Calculate u as the difference in x-coordinates
-            v.append((y1 - y2))         # Calculate v as the difference in y-coordinates
+    uv = baseline_vectors(antennas)     # u and v are the differences in x- and y-coordinates of every pair
 
-    print(f"u-v space calculated for {num_antennas} antennas.")
-    return u, v                         # Return lists of u and v values
+    print(f"u-v space calculated for {len(antennas)} antennas.")
+    return list(uv[:, 0]), list(uv[:, 1])      # Return lists of u and v values
 
 '''
 plot_uv
@@ -59,6 +61,7 @@ Outputs:
 
 def plot_uv(u, v, save=False, filename=False):
     print("Plotting u-v space...")
+    plt = pyplot()
 
     # Create a square plot to visualize the u-v coverage
     plt.figure(figsize=(3, 3))
@@ -0,0 +1,237 @@
+# This script deconvolves dirty images with the CLEAN algorithm (Clark's variant of Hogbom CLEAN).
+# Minor cycles find point components among the brightest residual pixels and subtract a restricted patch of the PSF
+# from those pixels only; major cycles subtract all components found so far from the full dirty image with an
+# FFT convolution. PSFs with grating lobes as high as the main lobe (regular arrays) are cleaned with Hogbom CLEAN,
+# which subtracts the full PSF for every component. The result is the component model, the residual image and the
+# restored image (the model convolved with a Gaussian clean beam plus the residual).
+
+# Importing all the necessary modules and packages
+import warnings
+import numpy as np
+from PSF import psf_image                   # Import the PSF of a uniformly weighted array
+
+# Define system-specific variables
+loop_gain = 0.1                     # Fraction of the peak that is subtracted per component
+patch_size = 51                     # Size of the PSF patch used in the minor cycles (pixels)
+max_iter = 10000                    # Maximal number of components
+max_major = None                    # Maximal number of major cycles (None: until threshold or max_iter)
+max_sidelobe = 0.5                  # PSFs with a larger sidelobe outside the patch are cleaned with Hogbom CLEAN
+
+
+'''
+double_psf
+This function calculates the PSF of an array on a grid that is twice as large as the image grid with the same
+pixel size, so that the PSF can be shifted to every pixel of the image (the PSF peak is at the center pixel).
+Inputs:
+    uv: UV coordinates (baseline coordinates between antenna pairs in meters)
+    num_pix: Number of pixels in each dimension of the image
+    frequency: Observation frequency (in Hz, float or Astropy quantity)
+    l_range: Range of l-coordinates of the image (default: 1 to -1)
+    m_range: Range of m-coordinates of the image (default: -1 to 1)
+Outputs:
+    psf: PSF image of shape (2*num_pix - 1, 2*num_pix - 1)
+'''
+
+def double_psf(uv, num_pix, frequency, l_range=(1.0, -1.0), m_range=(-1.0, 1.0)):
+    l_half = (l_range[0] - l_range[1]) / 2
+    m_half = (m_range[1] - m_range[0]) / 2
+    psf, _ = psf_image(uv, 2 * num_pix - 1, frequency, l_range=(2 * l_half, -2 * l_half),
+                       m_range=(-2 * m_half, 2 * m_half))
+    return psf
+
+
+'''
+_peak
+This function returns the pixel of the PSF peak. Grating lobes of regular arrays can be as high as the main lobe,
+so the center pixel (the peak of double_psf) is used when it reaches the maximum.
+'''
+
+def _peak(psf):
+    middle = tuple(s // 2 for s in psf.shape)
+    if psf[middle] >= psf.max() * (1 - 1e-6):
+        return middle
+    return np.unravel_index(np.argmax(psf), psf.shape)
+
+
+'''
+_convolver
+This function prepares an FFT convolution with the PSF, which is reused in every major cycle.
+The returned function convolves an image of shape (num_pix, num_pix) with the PSF, centered on the PSF peak.
+'''
+
+def _convolver(psf, shape):
+    from scipy import fft
+
+    center = _peak(psf)
+    size = [fft.next_fast_len(s + p - 1, real=True) for s, p in zip(shape, psf.shape)]
+    psf_fft = fft.rfft2(psf, size)
+
+    def convolve(image):
+        full = fft.irfft2(fft.rfft2(image, size) * psf_fft, size)
+        return full[center[0]:center[0] + shape[0], center[1]:center[1] + shape[1]]
+
+    return convolve
+
+
+'''
+clean_beam
+This function fits a Gaussian clean beam to the main lobe of the PSF, from the second moments of the connected
+region above half of the peak that contains the peak.
+Inputs:
+    psf: PSF image
+Outputs:
+    beam: Gaussian with the same shape as psf, peak 1 at the PSF peak
+'''
+
+def clean_beam(psf):
+    center = _peak(psf)
+    y, x = np.indices(psf.shape)
+    y, x = y - center[0], x - center[1]
+
+    # Main lobe: the region above half maximum that contains the peak
+    from scipy import ndimage
+    regions, _ = ndimage.label(psf >= psf[center] / 2)
+    lobe = regions == regions[center]
+
+    weights = psf[lobe]
+    cov = np.cov(np.stack((y[lobe], x[lobe])), aweights=weights)
+    # The weighted second moments of a 2D Gaussian cut at half maximum are (1 - ln2) times those of the full Gaussian
+    cov /= 1 - np.log(2)
+    inverse = np.linalg.inv(cov + 1e-9 * np.eye(2))
+    return np.exp(-0.5 * (inverse[0, 0] * y**2 + 2 * inverse[0, 1] * x * y + inverse[1, 1] * x**2))
+
+
+'''
+_hogbom
+This function runs Hogbom CLEAN on the residual image in place: it repeatedly adds gain times the brightest residual
+pixel to the model and subtracts the full shifted PSF (psf of shape (2*num_pix - 1, 2*num_pix - 1)) from the
+residual, until the peak residual is below the threshold or n_components reaches max_iter.
+Outputs:
+    n_components: Number of components after the minor cycles
+'''
+
+def _hogbom(residual, model, psf, center, gain, threshold, n_components, max_iter):
+    n_rows, n_cols = residual.shape
+    while n_components < max_iter:
+        row, col = np.unravel_index(np.argmax(np.abs(residual)), residual.shape)
+        if np.abs(residual[row, col]) <= threshold:
+            break
+        component = gain * residual[row, col]
+        model[row, col] += component
+        residual -= component * psf[center[0] - row:center[0] - row + n_rows, center[1] - col:center[1] - col + n_cols]
+        n_components += 1
+    return n_components
+
+
+'''
+clean
+This function deconvolves a dirty image with Clark CLEAN.
+In each major cycle the pixels brighter than the minor cycle limit (the largest PSF sidelobe outside the patch
+times the peak residual) are selected; the minor cycle repeatedly takes the brightest of these pixels, adds
+loop_gain times its value to the model and subtracts the PSF patch from the selected pixels. The major cycle then
+recomputes the residual from the dirty image and the model with an FFT convolution. When the largest sidelobe
+outside the patch is above max_sidelobe (grating lobes), the minor cycle limit would be close to the peak, so the
+components are found with Hogbom CLEAN instead (this needs a PSF of twice the image size, e.g. from double_psf).
+The cycles continue until the peak residual is below the threshold or max_iter components are found; a warning is
+given when the threshold is not reached.
+Inputs:
+    dirty: Dirty image (2D NumPy array of shape (num_pix, num_pix))
+    psf: PSF with the same pixel size as the dirty image, e.g. from double_psf (peak normalized to 1)
+    gain: Loop gain (default: 0.1)
+    threshold: Stop when the peak residual is below this value (default: 0)
+    max_iter: Maximal number of components (default: 10000)
+    patch: Size of the PSF patch of the minor cycles in pixels (default: 51)
+    max_major: Maximal number of major cycles, None for no limit (default: None)
+Outputs:
+    model: Image with the clean components
+    residual: Residual image (dirty image minus the model convolved with the PSF)
+    restored: Model convolved with the clean beam plus the residual
+'''
+
+def clean(dirty, psf, gain=loop_gain, threshold=0.0, max_iter=max_iter, patch=patch_size, max_major=max_major):
+    dirty = np.asarray(dirty, dtype=np.float64)
+    psf = np.asarray(psf, dtype=np.float64) / np.max(psf)
+    convolve = _convolver(psf, dirty.shape)
+
+    # PSF patch around the peak and the largest sidelobe outside of it
+    center = _peak(psf)
+    half = patch // 2
+    outside = np.abs(psf.copy())
+    outside[max(center[0] - half, 0):center[0] + half + 1, max(center[1] - half, 0):center[1] + half + 1] = 0
+    sidelobe = outside.max()
+
+    model = np.zeros_like(dirty)
+    residual = dirty.copy()
+    n_components = 0
+    major = 0
+
+    while max_major is None or major < max_major:
+        peak = np.abs(residual).max()
+        if peak <= threshold or n_components >= max_iter:
+            break
+        major += 1
+        if sidelobe > max_sidelobe:
+            n_components = _hogbom(residual, model, psf, center, gain, threshold, n_components, max_iter)
+            residual = dirty - convolve(model)
+            continue
+        limit = max(threshold, sidelobe * peak)
+
+        # Pixels taking part in the minor cycle and their residual values
+        rows, cols = np.nonzero(np.abs(residual) > limit)
+        if len(rows) == 0:
+            rows, cols = np.unravel_index([np.argmax(np.abs(residual))], residual.shape)
+        values = residual[rows, cols]
+
+        while n_components < max_iter:
+            k = np.argmax(np.abs(values))
+            if np.abs(values[k]) <= limit and n_components > 0:
+                break
+            component = gain * values[k]
+            model[rows[k], cols[k]] += component
+            n_components += 1
+
+            # Subtract the PSF patch from the selected pixels
+            dy, dx = rows - rows[k], cols - cols[k]
+            inside = (np.abs(dy) <= half) & (np.abs(dx) <= half)
+            py, px = center[0] + dy[inside], center[1] + dx[inside]
+            valid = (py >= 0) & (py < psf.shape[0]) & (px >= 0) & (px < psf.shape[1])
+            values[np.flatnonzero(inside)[valid]] -= component * psf[py[valid], px[valid]]
+
+            if np.abs(values).max() <= limit:
+                break
+
+        residual = dirty - convolve(model)
+
+    if threshold > 0 and np.abs(residual).max() > threshold:
+        warnings.warn(f"CLEAN stopped after {n_components} components and {major} major cycles with a peak residual "
+                      f"of {np.abs(residual).max():.3g}, above the threshold {threshold:.3g}")
+
+    restored = _convolver(clean_beam(psf), dirty.shape)(model) + residual
+    return model, residual, restored
+
+
+'''
+check_clean_beam
+This function checks clean_beam on elliptical, rotated Gaussians of known width and prints the fitted widths.
+Inputs:
+    sigmas: Standard deviations in pixels of the narrow axis of the test Gaussians (default: 3, 6 and 10)
+Outputs:
+    errors: Largest difference between every test Gaussian and its fitted beam
+'''
+
+def check_clean_beam(sigmas=(3, 6, 10)):
+    y, x = np.indices((121, 121)) - 60
+    u, v = (x + y) / np.sqrt(2), (y - x) / np.sqrt(2)
+    errors = []
+    for sigma in sigmas:
+        gaussian = np.exp(-0.5 * ((u / sigma)**2 + (v / (1.5 * sigma))**2))
+        beam = clean_beam(gaussian)
+        errors.append(np.abs(beam - gaussian).max())
+        fitted = np.sqrt(-1 / np.log(beam[61, 61])), np.sqrt(-1 / np.log(beam[59, 61]))
+        print(f"sigma {sigma} x {1.5 * sigma}: fitted {fitted[0]:.2f} x {fitted[1]:.2f}, "
+              f"largest difference {errors[-1]:.4f}")
+    return errors
+
+
+if __name__ == "__main__":
+    check_clean_beam()
@@ -0,0 +1,217 @@
+# This script evaluates many antenna layouts without the GUI.
+# It reads position CSV files (the presets and the files written by the optimizer GUI), calculates the baselines,
+# uv coverage, PSF metrics and redundancy of every layout on a pool of processes and writes a comparison table.
+# Optionally a PNG with the layout, the uv coverage and the PSF image is saved for every layout.
+
+# Importing all the necessary modules and packages
+import os
+import csv
+import glob
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Array import load_positions, baseline_lengths         # Import the preset loader and baseline lengths
+from Array import position_header                          # Import the header row of the position files
+from UV import baseline_vectors                            # Import batched baseline calculation
+from PSF import psf_image                                  # Import the fast PSF image
+from psf_metrics import psf_metrics                        # Import vectorized PSF quality metrics
+from layout_optimizer import layout_score                  # Import the score of the layout search
+from redundancy import redundancy_stats                    # Import the redundancy statistics
+
+# Define system-specific variables
+frequency = 1.42e9                  # Observation frequency in Hz (hydrogen line)
+num_pix = 256                       # Number of pixels of the PSF images in the PNG files
+columns = ['file', 'n_antennas', 'min_baseline', 'max_baseline', 'fwhm', 'peak_sidelobe', 'rms_sidelobe', 'uv_fill',
+           'n_unique', 'redundancy', 'score']
+
+
+'''
+is_position_file
+This function checks if a CSV file is a position file, i.e. starts with the header row of Array.save_positions.
+Inputs:
+    filename: Path of the CSV file
+Outputs:
+    True for a position file
+'''
+
+def is_position_file(filename):
+    with open(filename, 'r', newline='') as file:
+        return next(csv.reader(file), None) == position_header
+
+
+'''
+find_layouts
+This function collects the position CSV files of the given files and folders (all .csv files in a folder).
+Other CSV files (e.g. a comparison table written to the same folder) are skipped with a message.
+Inputs:
+    paths: List of CSV files and folders
+    exclude: List of files to leave out, e.g. the output table (default: none)
+Outputs:
+    files: Sorted list of CSV files
+'''
+
+def find_layouts(paths, exclude=()):
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(glob.glob(os.path.join(path, '*.csv')))
+        else:
+            files.add(path)
+
+    excluded = {os.path.abspath(filename) for filename in exclude}
+    layouts = []
+    for filename in sorted(files):
+        if os.path.abspath(filename) in excluded:
+            continue
+        if not is_position_file(filename):
+            print(f"Skipping '{filename}': no '{','.join(position_header)}' header.")
+            continue
+        layouts.append(filename)
+    return layouts
+
+
+'''
+evaluate_files
+This function evaluates a list of layout files. It is the function that runs on the worker processes.
+Layouts with the same number of antennas are evaluated together with the vectorized metrics.
+Inputs:
+    files: List of position CSV files
+    frequency: Observation frequency in Hz
+    png_folder: Folder for the PNG files, None for no PNG files
+Outputs:
+    rows: List of dictionaries with the columns of the comparison table
+'''
+
+def evaluate_files(files, frequency=frequency, png_folder=None):
+    layouts = {}
+    for filename in files:
+        positions = load_positions(filename)
+        layouts.setdefault(len(positions), []).append((filename, positions))
+
+    rows = []
+    for n_antennas, group in layouts.items():
+        names = [filename for filename, _ in group]
+        positions = np.stack([p for _, p in group])
+
+        metrics = psf_metrics(positions, frequency)
+        redundancy = redundancy_stats(positions)
+        lengths = baseline_lengths(positions)
+        score = layout_score(metrics)
+
+        for k, filename in enumerate(names):
+            rows.append({'file': filename, 'n_antennas': n_antennas,
+                         'min_baseline': lengths[k].min(), 'max_baseline': lengths[k].max(),
+                         'fwhm': metrics['fwhm'][k], 'peak_sidelobe': metrics['peak_sidelobe'][k],
+                         'rms_sidelobe': metrics['rms_sidelobe'][k], 'uv_fill': metrics['uv_fill'][k],
+                         'n_unique': redundancy['n_unique'][k], 'redundancy': redundancy['redundancy'][k],
+                         'score': score[k]})
+            if png_folder is not None:
+                plot_layout(positions[k], filename, rows[-1], frequency, png_folder)
+    return rows
+
+
+'''
+plot_layout
+This function saves the antenna positions, the uv coverage and the PSF image of one layout as a PNG file.
+Inputs:
+    positions: NumPy array of shape (n_antennas, 2) with the antenna positions in meters
+    filename: Position CSV file of the layout (used for the title and the name of the PNG file, which is prefixed
+              with the name of the folder of the CSV file, so e.g. a/x.csv and b/x.csv give a_x.png and b_x.png)
+    row: Row of the comparison table of the layout
+    frequency: Observation frequency in Hz
+    png_folder: Folder for the PNG file
+'''
+
+def plot_layout(positions, filename, row, frequency, png_folder):
+    import matplotlib
+    matplotlib.use('Agg')
+    from plotting import pyplot
+    plt = pyplot()
+
+    uv = baseline_vectors(positions)
+    psf, extent = psf_image(uv, num_pix, frequency)
+
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 5))
+    ax1.scatter(positions[:, 0], positions[:, 1], color='black')
+    ax1.set_xlabel('X (m)')
+    ax1.set_ylabel('Y (m)')
+    ax1.set_title('Antenna positions')
+    ax1.set_aspect('equal')
+
+    ax2.scatter(np.concatenate((uv[:, 0], -uv[:, 0])), np.concatenate((uv[:, 1], -uv[:, 1])), s=10, color='black')
+    ax2.set_xlabel('u (m)')
+    ax2.set_ylabel('v (m)')
+    ax2.set_title('uv coverage')
+    ax2.set_aspect('equal')
+
+    image = ax3.imshow(psf, extent=extent, origin='lower', cmap='viridis')
+    fig.colorbar(image, ax=ax3)
+    ax3.set_xlabel('l')
+    ax3.set_ylabel('m')
+    ax3.set_title('PSF')
+
+    fig.suptitle(f"{os.path.basename(filename)}: peak sidelobe {row['peak_sidelobe']:.3f}, "
+                 f"RMS sidelobe {row['rms_sidelobe']:.3f}, uv fill {row['uv_fill']:.3f}")
+    fig.tight_layout()
+
+    folder = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+    name = f'{folder}_{os.path.splitext(os.path.basename(filename))[0]}'
+    fig.savefig(os.path.join(png_folder, f'{name}.png'), bbox_inches='tight')
+    plt.close(fig)
+
+
+'''
+compare_layouts
+This function evaluates all layout files on a pool of processes.
+Inputs:
+    files: List of position CSV files
+    frequency: Observation frequency in Hz (default: 1.42 GHz)
+    png_folder: Folder for the PNG files, None for no PNG files (default: None)
+    workers: Number of worker processes, None for the number of CPUs (default: None)
+Outputs:
+    rows: List of dictionaries with the columns of the comparison table, sorted by score (best first)
+'''
+
+def compare_layouts(files, frequency=frequency, png_folder=None, workers=None):
+    workers = max(1, min(workers or os.cpu_count(), len(files)))
+    if png_folder is not None:
+        os.makedirs(png_folder, exist_ok=True)
+
+    chunks = [list(chunk) for chunk in np.array_split(np.array(files, dtype=object), workers) if len(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(evaluate_files, chunks, [frequency] * len(chunks), [png_folder] * len(chunks))
+        rows = [row for chunk_rows in results for row in chunk_rows]
+    return sorted(rows, key=lambda row: row['score'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparing the PSF and uv coverage of antenna layout files",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("paths", type=str, nargs='+', help="Position CSV files or folders with CSV files")
+    parser.add_argument("-o", "--output", type=str, default="layout_comparison.csv", help="CSV file for the table")
+    parser.add_argument("-p", "--png", type=str, default=None, help="Folder for a PNG file per layout")
+    parser.add_argument("-f", "--frequency", type=float, default=frequency, help="Observation frequency in Hz")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    start = time.time()
+    files = find_layouts(args.paths, exclude=[args.output])
+    if not files:
+        parser.error("no CSV files found")
+    rows = compare_layouts(files, args.frequency, args.png, args.workers)
+
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"{'file':40s} {'peak':>7s} {'rms':>7s} {'fill':>7s} {'fwhm':>7s} {'unique':>7s} {'score':>7s}")
+    for row in rows:
+        print(f"{os.path.basename(row['file']):40s} {row['peak_sidelobe']:7.3f} {row['rms_sidelobe']:7.3f} "
+              f"{row['uv_fill']:7.3f} {row['fwhm']:7.3f} {row['n_unique']:7d} {row['score']:7.3f}")
+    print(f"Evaluated {len(rows)} layouts in {time.time() - start:.1f} s, table written to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# This script searches for good antenna layouts without the GUI.
+# It runs an evolutionary search with an annealed step size over layouts within the ground grid,
+# scores every candidate with the PSF metrics and evaluates the candidates on a pool of processes.
+# The best layouts are saved as CSV files in the same format as the presets, so they can be loaded in the GUI.
+
+# Importing all the necessary modules and packages
+import os
+import time
+import argparse
+import numpy as np
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from psf_metrics import psf_metrics          # Import vectorized PSF quality metrics
+from Array import save_positions, sample_positions, baseline_lengths     # Import CSV export and layout kernels
+
+# Define system-specific variables
+num_antennas = 9                    # Number of antennas in the array
+grid_size = 2                       # Size of the ground in meters (antennas are placed within +-grid_size/2)
+min_distance = 0.185                # Minimum allowable distance between antennas in meters
+decimals = 2                        # Positions are rounded to centimeters, like the randomized layouts of the GUI
+
+
+'''
+layout_score
+This function combines the PSF metrics into a single score, lower is better.
+Inputs:
+    metrics: Dictionary with PSF metrics as returned by psf_metrics
+    weights: Tuple with the weights of the peak sidelobe, the RMS sidelobe and the uv fill fraction (default: (1, 1, 1))
+Outputs:
+    score: NumPy array with the score of every configuration
+'''
+
+def layout_score(metrics, weights=(1.0, 1.0, 1.0)):
+    w_peak, w_rms, w_fill = weights
+    return w_peak * metrics['peak_sidelobe'] + w_rms * metrics['rms_sidelobe'] - w_fill * metrics['uv_fill']
+
+
+'''
+evaluate_layouts
+This function scores a stack of layouts. It is the function that runs on the worker processes.
+Inputs:
+    positions: NumPy array of shape (n_configs, n_antennas, 2) with antenna coordinates in meters
+    weights: Weights of the score (see layout_score)
+Outputs:
+    score: NumPy array of shape (n_configs,) with the score of every layout
+'''
+
+def evaluate_layouts(positions, weights):
+    return layout_score(psf_metrics(positions), weights)
+
+
+'''
+mutate
+This function creates offspring by moving one or two antennas of randomly chosen parent layouts.
+Offspring that break the minimum distance constraint are replaced by a copy of their parent.
+Inputs:
+    parents: NumPy array of shape (n_parents, num_antennas, 2) with the parent layouts
+    n_offspring: Number of offspring to create
+    step: Standard deviation of the antenna displacement in meters
+    rng: NumPy random generator
+Outputs:
+    offspring: NumPy array of shape (n_offspring, num_antennas, 2)
+'''
+
+def mutate(parents, n_offspring, step, rng):
+    offspring = parents[rng.integers(len(parents), size=n_offspring)].copy()
+    rows = np.arange(n_offspring)
+
+    # Move one antenna in every offspring and a second one in half of them
+    for moved in (rows, rows[rng.random(n_offspring) < 0.5]):
+        antenna = rng.integers(num_antennas, size=len(moved))
+        offspring[moved, antenna] += rng.normal(0, step, size=(len(moved), 2))
+
+    offspring = np.round(np.clip(offspring, -grid_size/2, grid_size/2), decimals)
+
+    invalid = baseline_lengths(offspring).min(axis=-1) < min_distance
+    offspring[invalid] = parents[rng.integers(len(parents), size=invalid.sum())]
+    return offspring
+
+
+'''
+optimize_layouts
+This function searches for the layouts with the lowest score with a (mu + lambda) evolutionary search.
+The mutation step size is annealed from start_step to end_step over the iteration or time budget.
+Inputs:
+    n_population: Number of layouts kept after every iteration (default: 64)
+    n_offspring: Number of new candidates evaluated per iteration (default: 512)
+    max_iter: Maximal number of iterations (default: 200)
+    time_limit: Maximal run time in seconds, None for no limit (default: None)
+    workers: Number of worker processes, None for the number of CPUs (default: None)
+    weights: Weights of the score (see layout_score)
+    start_step, end_step: Mutation step size at the start and at the end of the search in meters
+    seed: Seed of the random number generator (default: None)
+Outputs:
+    population: NumPy array of shape (n_population, num_antennas, 2) sorted from best to worst
+    scores: NumPy array with the score of every layout in population
+'''
+
+def optimize_layouts(n_population=64, n_offspring=512, max_iter=200, time_limit=None, workers=None,
+                     weights=(1.0, 1.0, 1.0), start_step=0.25, end_step=0.02, seed=None):
+    rng = np.random.default_rng(seed)
+    workers = workers or os.cpu_count()
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Score a stack of layouts by splitting it over the worker processes
+        def evaluate(positions):
+            chunks = [chunk for chunk in np.array_split(positions, workers) if len(chunk)]
+            return np.concatenate(list(pool.map(evaluate_layouts, chunks, repeat(weights))))
+
+        population = sample_positions(n_population, num_antennas, grid_size, min_distance, decimals, rng=rng)
+        scores = evaluate(population)
+
+        for iteration in range(max_iter):
+            # Fraction of the budget that has been used, for annealing the step size
+            progress = iteration / max_iter
+            if time_limit is not None:
+                progress = max(progress, (time.time() - start) / time_limit)
+                if progress >= 1:
+                    break
+            step = start_step * (end_step / start_step)**progress
+
+            offspring = mutate(population, n_offspring, step, rng)
+            candidates = np.concatenate((population, offspring))
+            candidate_scores = np.concatenate((scores, evaluate(offspring)))
+
+            # Keep the best unique layouts
+            _, unique = np.unique(candidates.reshape(len(candidates), -1), axis=0, return_index=True)
+            best = unique[np.argsort(candidate_scores[unique])][:n_population]
+            population, scores = candidates[best], candidate_scores[best]
+
+            print(f"Iteration {iteration + 1}: best score {scores[0]:.4f} (step {step:.3f} m, "
+                  f"{time.time() - start:.1f} s)")
+
+    return population, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Searching for antenna layouts with low PSF sidelobes and good uv coverage",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-o", "--output", type=str, default="optimized", help="Folder for the best layouts")
+    parser.add_argument("-n", "--best", type=int, default=5, help="Number of best layouts to save")
+    parser.add_argument("-i", "--iterations", type=int, default=200, help="Maximal number of iterations")
+    parser.add_argument("-t", "--time", type=float, default=None, help="Maximal run time in seconds")
+    parser.add_argument("-p", "--population", type=int, default=64, help="Number of layouts kept per iteration")
+    parser.add_argument("--offspring", type=int, default=512, help="Number of candidates per iteration")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--weights", type=float, nargs=3, default=(1.0, 1.0, 1.0),
+                        help="Weights of the peak sidelobe, RMS sidelobe and uv fill fraction")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random number generator")
+    args = parser.parse_args()
+
+    population, scores = optimize_layouts(n_population=args.population, n_offspring=args.offspring,
+                                          max_iter=args.iterations, time_limit=args.time, workers=args.workers,
+                                          weights=tuple(args.weights), seed=args.seed)
+
+    # Save the best layouts in the preset format
+    os.makedirs(args.output, exist_ok=True)
+    metrics = psf_metrics(population[:args.best])
+    for k in range(min(args.best, len(population))):
+        filename = os.path.join(args.output, f'optimized_{k + 1}.csv')
+        save_positions(population[k], filename)
+        print(f"{filename}: score {scores[k]:.4f}, peak sidelobe {metrics['peak_sidelobe'][k]:.3f}, "
+              f"RMS sidelobe {metrics['rms_sidelobe'][k]:.3f}, uv fill {metrics['uv_fill'][k]:.3f}, "
+              f"FWHM {metrics['fwhm'][k]:.3f} rad")
+
+
+if __name__ == "__main__":
+    main()
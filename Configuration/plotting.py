@@ -0,0 +1,19 @@
+# This script loads matplotlib for the plotting functions of the configuration scripts.
+# matplotlib is only imported when the first plot is made, so the calculations can be imported
+# (e.g. by batch jobs and worker processes, or without a display) without paying its start-up cost.
+
+'''
+pyplot
+This function imports matplotlib.pyplot and sets the font style used by all plots.
+Inputs:
+    None
+Outputs:
+    plt: The matplotlib.pyplot module
+'''
+
+def pyplot():
+    import matplotlib.pyplot as plt
+
+    # Set desired font style for matplotlib plots
+    plt.rcParams.update({"font.family": 'serif'})                 # Use serif fonts
+    return plt
@@ -0,0 +1,170 @@
+# This script calculates quality metrics of the point-spread function (PSF) directly from antenna positions.
+# Instead of rendering the full PSF image with make_image, it only evaluates the PSF on a few radial lines
+# and a sparse set of sky samples, vectorized over many candidate configurations at once.
+
+# Importing all the necessary modules and packages
+import numpy as np
+from UV import baseline_vectors              # Import batched baseline calculation
+from PSF import speed_of_light               # Speed of light in m/s
+
+# Define system-specific variables
+paint_can_diameter = 0.183          # Paint can diameter in meters (represents the size of the antennas)
+grid_size = 2                       # Size of the ground in meters (antennas are placed within +-grid_size/2)
+frequency_default = 1.42e9          # Observation frequency in Hz (hydrogen line)
+max_elements = 2**22                # Maximum number of (config, antenna, sample) elements evaluated at once
+
+
+'''
+_to_hz
+This function converts a frequency to a plain float in Hz.
+Inputs:
+    frequency: Frequency as a float in Hz or as an Astropy quantity
+Outputs:
+    The frequency in Hz (float)
+'''
+
+def _to_hz(frequency):
+    if hasattr(frequency, 'unit'):
+        return frequency.to_value('Hz')
+    return float(frequency)
+
+
+'''
+psf_samples
+This function evaluates the PSF of a uniformly weighted array (all ones correlation matrix, as used in the
+optimizer GUI) at arbitrary sky positions, for many configurations at once.
+Instead of summing a cosine for every baseline, it uses the array factor F(l, m) = sum_i exp(2j*pi*(x_i*l + y_i*m)/lambda),
+for which the mean over all baselines (i < j) equals (|F|^2 - n_antennas) / (n_antennas*(n_antennas - 1)).
+Inputs:
+    positions: A NumPy array of shape (n_configs, n_antennas, 2) with antenna coordinates in meters
+    lm: A NumPy array of shape (n_samples, 2) with (l, m) direction cosines of the sky samples
+    frequency: Observation frequency in Hz (default: 1.42 GHz)
+Outputs:
+    psf: A NumPy array of shape (n_configs, n_samples) with the PSF value at every sample (1 at the origin)
+'''
+
+def psf_samples(positions, lm, frequency=frequency_default):
+    positions = np.asarray(positions, dtype=np.float64)
+    lm = np.asarray(lm, dtype=np.float32)
+    n_configs, n_antennas = positions.shape[:2]
+
+    # Scale the positions to radians of phase per unit direction cosine
+    k_pos = (positions * (2 * np.pi * _to_hz(frequency) / speed_of_light)).astype(np.float32)
+
+    # Split the configurations into chunks to keep the (config, antenna, sample) array in memory
+    chunk = max(1, max_elements // max(1, n_antennas * len(lm)))
+    psf = np.empty((n_configs, len(lm)), dtype=np.float32)
+    for start in range(0, n_configs, chunk):
+        phase = k_pos[start:start + chunk] @ lm.T                   # (chunk, n_antennas, n_samples)
+        power = np.cos(phase).sum(axis=1)**2 + np.sin(phase).sum(axis=1)**2
+        psf[start:start + chunk] = (power - n_antennas) / (n_antennas * (n_antennas - 1))
+
+    return psf
+
+
+'''
+uv_fill_fraction
+This function calculates which fraction of the uv plane is covered by the baselines of each configuration.
+The uv plane (including the mirrored baselines) is divided into square cells of one antenna diameter and
+the fraction of the cells within the maximal baseline length that contain at least one baseline is counted.
+Inputs:
+    uv: A NumPy array of shape (n_configs, n_baselines, 2) with baseline coordinates in meters
+    cell_size: Size of a uv cell in meters (default: paint can diameter)
+    uv_max: Radius of the uv disc that should be covered in meters (default: diagonal of the ground grid)
+Outputs:
+    fill: A NumPy array of shape (n_configs,) with the filled fraction of the uv disc (between 0 and 1)
+'''
+
+def uv_fill_fraction(uv, cell_size=paint_can_diameter, uv_max=grid_size*np.sqrt(2)):
+    uv = np.asarray(uv, dtype=np.float64)
+    n_configs = uv.shape[0]
+
+    # Cells of the uv grid that lie within the uv disc
+    n_side = 2 * int(np.ceil(uv_max / cell_size))
+    centers = (np.arange(n_side) - n_side / 2 + 0.5) * cell_size
+    in_disc = (centers[:, None]**2 + centers[None, :]**2) <= uv_max**2
+
+    # Index the cell of every baseline and its mirror image
+    points = np.concatenate((uv, -uv), axis=1)
+    cells = np.floor(points / cell_size + n_side / 2).astype(np.int64)
+    cells = np.clip(cells, 0, n_side - 1)
+    flat = cells[..., 0] * n_side + cells[..., 1] + (np.arange(n_configs) * n_side**2)[:, None]
+
+    # Count the occupied cells of each configuration in one go
+    occupied = np.zeros(n_configs * n_side**2, dtype=bool)
+    occupied[flat.ravel()] = True
+    occupied = occupied.reshape(n_configs, n_side, n_side) & in_disc
+
+    return occupied.sum(axis=(1, 2)) / in_disc.sum()
+
+
+'''
+psf_metrics
+This function calculates the main PSF quality metrics for one or many antenna configurations.
+The PSF is evaluated along radial lines through the origin to find the main lobe, and on a sparse random set
+of samples covering the image plane of make_image (l and m between -1 and 1) for the sidelobes.
+Inputs:
+    positions: A NumPy array of shape (n_antennas, 2) or (n_configs, n_antennas, 2) with antenna coordinates in meters
+    frequency: Observation frequency in Hz (default: 1.42 GHz)
+    n_angles: Number of radial lines through the origin (default: 8)
+    n_radii: Number of samples along each radial line (default: 512)
+    n_samples: Number of random sidelobe samples in the image plane (default: 2048)
+    seed: Seed of the random sidelobe samples, identical for every configuration (default: 0)
+Outputs:
+    metrics: Dictionary with NumPy arrays of shape (n_configs,) (or floats for a single configuration):
+        'fwhm': Full width at half maximum of the main lobe in radians (averaged over the radial lines)
+        'peak_sidelobe': Highest PSF value outside the main lobe
+        'rms_sidelobe': Root mean square of the PSF outside the main lobe
+        'uv_fill': Filled fraction of the uv plane (see uv_fill_fraction)
+'''
+
+def psf_metrics(positions, frequency=frequency_default, n_angles=8, n_radii=512, n_samples=2048, seed=0):
+    positions = np.asarray(positions, dtype=np.float64)
+    single = positions.ndim == 2
+    if single:
+        positions = positions[None]
+
+    uv = baseline_vectors(positions)
+
+    # Radial lines through the origin, the PSF is point symmetric so half a circle is enough
+    angles = np.arange(n_angles) * np.pi / n_angles
+    radii = np.linspace(0, 1, n_radii)
+    directions = np.stack((np.cos(angles), np.sin(angles)), axis=-1)
+    line_lm = (directions[:, None, :] * radii[None, :, None]).reshape(-1, 2)
+    lines = psf_samples(positions, line_lm, frequency).reshape(-1, n_angles, n_radii)
+
+    # Half maximum crossing along every line (linear interpolation between the neighbouring samples)
+    below = lines < 0.5
+    below[..., -1] = True
+    i_half = np.argmax(below, axis=-1)
+    p0 = np.take_along_axis(lines, np.maximum(i_half - 1, 0)[..., None], axis=-1)[..., 0]
+    p1 = np.take_along_axis(lines, i_half[..., None], axis=-1)[..., 0]
+    frac = (p0 - 0.5) / np.where(p0 != p1, p0 - p1, 1.0)
+    r_half = radii[np.maximum(i_half - 1, 0)] + np.clip(frac, 0, 1) * (radii[1] - radii[0])
+    fwhm = 2 * r_half.mean(axis=-1)
+
+    # The main lobe ends at the first minimum along each line
+    rising = np.diff(lines, axis=-1) > 0
+    rising[..., -1] = True
+    r_null = radii[np.argmax(rising, axis=-1)]
+    in_lobe = radii[None, None, :] <= r_null[..., None]
+
+    # Sparse sidelobe samples outside the widest extent of the main lobe
+    rng = np.random.default_rng(seed)
+    sample_lm = rng.uniform(-1, 1, size=(n_samples, 2))
+    samples = psf_samples(positions, sample_lm, frequency)
+    outside = np.hypot(*sample_lm.T)[None, :] > r_null.max(axis=-1)[:, None]
+
+    sidelobes = np.concatenate((np.where(in_lobe, np.nan, lines).reshape(len(uv), n_angles * n_radii),
+                                np.where(outside, samples, np.nan)), axis=-1)
+    peak_sidelobe = np.nanmax(sidelobes, axis=-1)
+    rms_sidelobe = np.sqrt(np.nanmean(sidelobes**2, axis=-1))
+
+    metrics = {'fwhm': fwhm,
+               'peak_sidelobe': peak_sidelobe,
+               'rms_sidelobe': rms_sidelobe,
+               'uv_fill': uv_fill_fraction(uv)}
+
+    if single:
+        return {key: float(value[0]) for key, value in metrics.items()}
+    return metrics
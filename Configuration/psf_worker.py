@@ -0,0 +1,80 @@
+# This script computes the uv coverage and point-spread function (PSF) of an antenna configuration on a
+# background thread, so the optimizer GUI stays responsive while the images are calculated.
+# Results and progress updates are put on a queue that the GUI polls from its own event loop.
+
+# Importing all the necessary modules and packages
+import queue
+import threading
+import numpy as np
+from UV import baseline_vectors             # Import batched baseline calculation
+from PSF import iter_psf_image, psf_extent  # Import block-wise PSF calculation
+
+
+'''
+PSFWorker
+This class runs PSF computations on a single background thread.
+Every submitted job gets a job number. Submitting a new job or calling cancel makes all older jobs stale:
+a stale job that is still waiting is skipped, and a stale job that is running stops at its next block of rows.
+Messages on the results queue are tuples (kind, job, data):
+    ('progress', job, fraction): fraction of the PSF image that has been calculated (between 0 and 1)
+    ('done', job, result): dictionary with the 'positions', 'uv', 'psf', 'psf_extent' and 'num_pix' of the job
+'''
+
+class PSFWorker:
+
+    def __init__(self, block_rows=16):
+        self.block_rows = block_rows            # Number of PSF rows calculated between cancellation checks
+        self.results = queue.Queue()            # Messages for the GUI
+        self._jobs = queue.Queue()              # Jobs waiting for the background thread
+        self._latest = 0                        # Number of the most recent job, older jobs are stale
+        self._lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    '''
+    submit
+    This function hands a new PSF computation to the background thread and makes older jobs stale.
+    Inputs:
+        positions: NumPy array of shape (n_antennas, 2) with the antenna positions in meters
+        num_pix: Number of pixels in each dimension of the PSF image
+        frequency: Observation frequency (in Hz, float or Astropy quantity)
+    Outputs:
+        job: Number of the submitted job
+    '''
+
+    def submit(self, positions, num_pix, frequency):
+        with self._lock:
+            self._latest += 1
+            job = self._latest
+        self._jobs.put((job, np.array(positions, dtype=np.float64), num_pix, frequency))
+        return job
+
+    '''
+    cancel
+    This function makes all submitted jobs stale, e.g. because the antenna positions changed.
+    '''
+
+    def cancel(self):
+        with self._lock:
+            self._latest += 1
+
+    def is_current(self, job):
+        return job == self._latest
+
+    def _run(self):
+        while True:
+            job, positions, num_pix, frequency = self._jobs.get()
+            if not self.is_current(job):
+                continue
+
+            uv = baseline_vectors(positions)
+            psf = np.zeros((num_pix, num_pix), dtype=np.float32)
+            for start, block in iter_psf_image(uv, num_pix, frequency, block_rows=self.block_rows):
+                if not self.is_current(job):
+                    break
+                psf[start:start + len(block)] = block
+                self.results.put(('progress', job, (start + len(block)) / num_pix))
+            else:
+                self.results.put(('done', job, {'positions': positions, 'uv': uv, 'psf': psf,
+                                                 'psf_extent': psf_extent(num_pix), 'num_pix': num_pix}))
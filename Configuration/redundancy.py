@@ -0,0 +1,299 @@
+# This script analyses the redundancy of antenna layouts and calibrates redundant arrays without a sky model.
+# Baselines with the same (u, v) vector (within a tolerance) measure the same visibility, so they are grouped by
+# hashing their rounded (u, v) vectors; this is done for many layouts at once. For calibration, the gains of all
+# antennas and the visibility of every redundant group are solved together with alternating least squares followed by
+# Levenberg-Marquardt steps, for chunks of channels and integrations at once.
+
+# Importing all the necessary modules and packages
+import numpy as np
+from UV import baseline_vectors             # Import batched baseline calculation
+
+# Define system-specific variables
+tolerance = 0.01                    # Baselines that differ less than this (in meters) are redundant
+max_iter = 200                      # Maximal number of iterations of each stage of the redundant calibration
+coarse = 1e-4                       # Relative change of the gains at which the first stage (ALS) hands over
+convergence = 1e-8                  # Size of the gain correction at which the calibration of a cell stops
+max_elements = 2**22                # Maximal number of cells x baselines x parameters of the Jacobian at once
+
+
+'''
+redundant_groups
+This function groups the baselines of one or many layouts into redundant sets.
+Baselines b and -b measure complex conjugate visibilities, so every baseline is first turned into the half plane
+with u > 0 (or u = 0 and v >= 0); the rounded vector is the key of its group.
+Inputs:
+    antennas: A NumPy array of shape (n_antennas, 2) or (n_configs, n_antennas, 2) with antenna positions in meters
+    tolerance: Size of the rounding grid in meters (default: 0.01)
+Outputs:
+    labels: Integer NumPy array of shape (..., n_baselines) with the group of every baseline (0, 1, ... per layout)
+    flipped: Boolean NumPy array of shape (..., n_baselines), True where the baseline was reversed
+'''
+
+def redundant_groups(antennas, tolerance=tolerance):
+    uv = baseline_vectors(antennas)
+    keys = np.round(uv / tolerance).astype(np.int64)
+    flipped = (keys[..., 0] < 0) | ((keys[..., 0] == 0) & (keys[..., 1] < 0))
+    keys = np.where(flipped[..., None], -keys, keys)
+
+    # One integer per key, then group labels per layout by sorting
+    span = 2 * np.abs(keys).max() + 1
+    codes = keys[..., 0] * span + keys[..., 1]
+    order = np.argsort(codes, axis=-1, kind='stable')
+    sorted_codes = np.take_along_axis(codes, order, axis=-1)
+    new = np.concatenate((np.zeros(codes.shape[:-1] + (1,), dtype=np.int64),
+                          (np.diff(sorted_codes, axis=-1) != 0).astype(np.int64)), axis=-1)
+
+    labels = np.empty_like(codes)
+    np.put_along_axis(labels, order, np.cumsum(new, axis=-1), axis=-1)
+    return labels, flipped
+
+
+'''
+redundancy_stats
+This function summarizes the redundancy of one or many layouts for layout design.
+Inputs:
+    antennas: A NumPy array of shape (n_antennas, 2) or (n_configs, n_antennas, 2) with antenna positions in meters
+    tolerance: Size of the rounding grid in meters (default: 0.01)
+Outputs:
+    stats: Dictionary with for every layout
+        'n_baselines': Number of baselines
+        'n_unique': Number of redundant groups (different uv points)
+        'redundancy': Fraction of baselines that repeat another baseline (1 - n_unique / n_baselines)
+        'max_group': Number of baselines in the largest group
+        'redundant_baselines': Number of baselines in groups with at least two baselines
+'''
+
+def redundancy_stats(antennas, tolerance=tolerance):
+    labels, _ = redundant_groups(antennas, tolerance)
+    n_baselines = labels.shape[-1]
+
+    # Size of every group, counted per layout
+    flat = labels.reshape(-1, n_baselines)
+    offsets = np.arange(len(flat))[:, None] * n_baselines
+    sizes = np.bincount((flat + offsets).ravel(), minlength=len(flat) * n_baselines).reshape(len(flat), n_baselines)
+    sizes = sizes.reshape(labels.shape)
+
+    n_unique = labels.max(axis=-1) + 1
+    return {'n_baselines': np.full(n_unique.shape, n_baselines),
+            'n_unique': n_unique,
+            'redundancy': 1 - n_unique / n_baselines,
+            'max_group': sizes.max(axis=-1),
+            'redundant_baselines': np.where(sizes > 1, sizes, 0).sum(axis=-1)}
+
+
+'''
+_cost
+This function returns the sum of the squared residuals of the redundant model of every cell.
+'''
+
+def _cost(data, gains, group, first, second, labels):
+    return np.sum(np.abs(data - gains[:, first] * np.conj(gains[:, second]) * group[:, labels])**2, axis=1)
+
+
+'''
+_phase_tree
+This function returns the order in which the gain phases are unwrapped: starting at antenna 0, every next antenna is
+the one closest to an antenna that is already unwrapped (a minimum spanning tree), so every phase difference is
+taken over a short distance.
+Outputs:
+    pairs: List of (antenna, parent) pairs in the order of the unwrapping
+'''
+
+def _phase_tree(antennas):
+    distances = np.linalg.norm(antennas[:, None] - antennas[None], axis=-1)
+    done = np.zeros(len(antennas), dtype=bool)
+    done[0] = True
+    pairs = []
+    for _ in range(len(antennas) - 1):
+        masked = np.where(done[:, None] & ~done[None], distances, np.inf)
+        parent, antenna = np.unravel_index(np.argmin(masked), masked.shape)
+        pairs.append((antenna, parent))
+        done[antenna] = True
+    return pairs
+
+
+'''
+_solve_cells
+This function runs both stages of redundant_calibration for a chunk of cells.
+Inputs:
+    data: Complex NumPy array of shape (n_cells, n_baselines) with the baselines of the useful groups
+    first, second: Antennas of every baseline
+    labels: Group of every baseline, numbered 0, 1, ...
+    n_antennas: Number of antennas
+    max_iter, convergence: See redundant_calibration
+Outputs:
+    gains: Complex NumPy array of shape (n_cells, n_antennas), before the degeneracies are fixed
+    converged: Boolean NumPy array of shape (n_cells,)
+    iterations: Integer NumPy array of shape (n_cells,)
+'''
+
+def _solve_cells(data, first, second, labels, n_antennas, max_iter=max_iter, convergence=convergence):
+    rows = np.arange(len(labels))
+    n_groups = labels.max() + 1
+    n_parameters = 2 * n_antennas + 2 * n_groups
+    weights = np.zeros((len(rows), n_groups))
+    weights[rows, labels] = 1
+
+    gains = np.ones((len(data), n_antennas), dtype=np.complex128)
+    iterations = np.zeros(len(data), dtype=int)
+    converged = np.zeros(len(data), dtype=bool)
+
+    # Alternating least squares until the gains are close to the solution: the group visibilities from the calibrated
+    # baselines, then one gain step per antenna as in StEFCal (see gain_calibration.solve_gains); the indices of the
+    # cells that are still iterating are kept in active
+    full = np.zeros((len(data), n_antennas, n_antennas), dtype=np.complex128)
+    full[:, first, second] = data
+    full[:, second, first] = np.conj(data)
+    active = np.arange(len(data))
+    for iteration in range(max_iter):
+        if len(active) == 0:
+            break
+        g = gains[active]
+        pair = g[:, first] * np.conj(g[:, second])
+        y = (np.conj(pair) * data[active]) @ weights / np.maximum(np.abs(pair)**2 @ weights, np.finfo(float).tiny)
+        model = np.zeros((len(active), n_antennas, n_antennas), dtype=np.complex128)
+        model[:, first, second] = y[:, labels]
+        model[:, second, first] = np.conj(y[:, labels])
+        z = g[:, :, None] * model
+        power = np.einsum('cip,cip->cp', np.conj(z), z).real
+        new_gains = np.einsum('cip,cip->cp', np.conj(full[active]), z) / np.where(power > 0, power, 1)
+        new_gains = np.where(power > 0, new_gains, g)
+        if iteration % 2 == 1:
+            new_gains = (new_gains + g) / 2
+        gains[active] = new_gains
+
+        change = np.abs(new_gains - g).max(axis=-1) / np.maximum(np.abs(new_gains).max(axis=-1), np.finfo(float).tiny)
+        iterations[active] = iteration + 1
+        active = active[change >= coarse]
+    del full
+
+    pair = gains[:, first] * np.conj(gains[:, second])
+    group = (np.conj(pair) * data) @ weights / np.maximum(np.abs(pair)**2 @ weights, np.finfo(float).tiny)
+
+    # Levenberg-Marquardt, with a damping factor per cell
+    active = np.arange(len(data))
+    damping = np.full(len(data), 1e-3)
+    cost = _cost(data, gains, group, first, second, labels)
+    for iteration in range(max_iter):
+        if len(active) == 0:
+            break
+        g, y = gains[active], group[active]
+        pair = g[:, first] * np.conj(g[:, second])
+        model = pair * y[:, labels]
+        residual = data[active] - model
+
+        # Derivatives of the model to eta and phi of both antennas and to the real and imaginary part of y_k
+        jacobian = np.zeros((len(active), len(rows), n_parameters), dtype=np.complex128)
+        jacobian[:, rows, first] = model
+        jacobian[:, rows, second] = model
+        jacobian[:, rows, n_antennas + first] = 1j * model
+        jacobian[:, rows, n_antennas + second] = -1j * model
+        jacobian[:, rows, 2 * n_antennas + labels] = pair
+        jacobian[:, rows, 2 * n_antennas + n_groups + labels] = 1j * pair
+
+        # Damped normal equations; the damping also regularizes the degenerate directions
+        adjoint = np.conj(jacobian).transpose(0, 2, 1)
+        normal = np.matmul(adjoint, jacobian).real
+        gradient = np.matmul(adjoint, residual[..., None])[..., 0].real
+        diagonal = np.einsum('cpp->cp', normal)
+        scale = diagonal + 1e-12 * diagonal.max(axis=1, keepdims=True)
+        normal[:, np.arange(n_parameters), np.arange(n_parameters)] += damping[active, None] * scale
+        step = np.linalg.solve(normal, gradient[..., None])[..., 0]
+
+        eta, phi = step[:, :n_antennas], step[:, n_antennas:2 * n_antennas]
+        epsilon = step[:, 2 * n_antennas:2 * n_antennas + n_groups] + 1j * step[:, 2 * n_antennas + n_groups:]
+        new_gains, new_group = g * np.exp(eta + 1j * phi), y + epsilon
+        new_cost = _cost(data[active], new_gains, new_group, first, second, labels)
+
+        # Accept the steps that lower the cost, otherwise increase the damping of the cell
+        better = new_cost < cost[active]
+        gains[active[better]], group[active[better]] = new_gains[better], new_group[better]
+        cost[active[better]] = new_cost[better]
+        damping[active] = np.where(better, damping[active] / 3, damping[active] * 4)
+
+        change = np.maximum(np.abs(np.concatenate((eta, phi), axis=1)).max(axis=1),
+                            np.abs(epsilon).max(axis=1) / np.maximum(np.abs(y).max(axis=1), np.finfo(float).tiny))
+        done = (change < convergence) | (cost[active] <= 1e-30 * np.sum(np.abs(data[active])**2, axis=1))
+        iterations[active] += 1
+        converged[active[done]] = True
+        active = active[~done]
+    return gains, converged, iterations
+
+
+'''
+redundant_calibration
+This function solves V_ij = g_i conj(g_j) y_k for the antenna gains g and the visibility y_k of every redundant group,
+without a sky model, for every channel and integration (cell). The first stage starts from unit gains and
+alternates between the group visibilities (a weighted average of the calibrated baselines of each group) and the
+gains (one alternating least-squares step per antenna, as in StEFCal) until the gains change less than coarse.
+The second stage finishes with Levenberg-Marquardt steps of the linearized equations for a relative gain correction
+g_i (1 + eta_i + i phi_i) and a correction of the group visibilities, which converge quickly near the solution.
+Every cell stops on its own convergence. The cells are solved in chunks of at most max_elements Jacobian entries.
+A redundant array cannot determine the overall amplitude, the overall phase and a phase gradient over the array;
+these are fixed by setting the mean gain amplitude to 1 and removing the best fitting phase plane (a + b . x_i)
+from the gain phases. The phases are unwrapped from antenna 0 over the shortest distances (see _phase_tree) before
+the plane is fitted. Only groups with at least two baselines constrain the gains; antennas without such baselines
+keep a gain of 1.
+Inputs:
+    visibilities: Complex NumPy array of shape (..., n_antennas, n_antennas), e.g. (n_integrations, n_channels, n, n)
+    antennas: A NumPy array of shape (n_antennas, 2) with the antenna positions in meters
+    tolerance: Size of the rounding grid in meters (default: 0.01)
+    max_iter: Maximal number of iterations of each stage (default: 200)
+    convergence: Size of the gain correction at which the iteration of a cell stops (default: 1e-8)
+    max_elements: Maximal number of cells x baselines x parameters of the Jacobian at once (default: 2**22)
+Outputs:
+    gains: Complex NumPy array of shape (..., n_antennas)
+    group_visibilities: Complex NumPy array of shape (..., n_groups), for the group keys in the half plane u >= 0
+    labels: Group of every baseline (see redundant_groups)
+    converged: Boolean NumPy array of shape (...), False for the cells that did not converge within max_iter
+    iterations: Integer NumPy array of shape (...) with the number of iterations of every cell (both stages)
+'''
+
+def redundant_calibration(visibilities, antennas, tolerance=tolerance, max_iter=max_iter, convergence=convergence,
+                          max_elements=max_elements):
+    visibilities = np.asarray(visibilities, dtype=np.complex128)
+    antennas = np.asarray(antennas, dtype=np.float64)
+    n_antennas = len(antennas)
+    shape = visibilities.shape[:-2]
+    labels, flipped = redundant_groups(antennas, tolerance)
+    n_groups = labels.max() + 1
+    i, j = np.triu_indices(n_antennas, k=1)
+
+    # Baselines in the half plane of their group key: V_ij for unflipped baselines, V_ji = conj(V_ij) for flipped ones,
+    # for all channels and integrations as cells, (n_cells, n_baselines)
+    first, second = np.where(flipped, j, i), np.where(flipped, i, j)
+    data = visibilities.reshape((-1, n_antennas, n_antennas))[:, first, second]
+
+    # Indicator matrix of the groups, (n_baselines, n_groups)
+    members = np.zeros((len(labels), n_groups))
+    members[np.arange(len(labels)), labels] = 1
+
+    # Baselines of groups with at least two baselines, with their groups numbered 0, 1, ...
+    useful = members.sum(axis=0)[labels] > 1
+    gains = np.ones((len(data), n_antennas), dtype=np.complex128)
+    converged = np.ones(len(data), dtype=bool)
+    iterations = np.zeros(len(data), dtype=int)
+    if np.any(useful):
+        _, u_labels = np.unique(labels[useful], return_inverse=True)
+        n_parameters = 2 * n_antennas + 2 * (u_labels.max() + 1)
+        chunk = max(1, max_elements // (len(u_labels) * n_parameters))
+        for start in range(0, len(data), chunk):
+            part = slice(start, start + chunk)
+            gains[part], converged[part], iterations[part] = _solve_cells(
+                data[part][:, useful], first[useful], second[useful], u_labels, n_antennas, max_iter, convergence)
+
+    # Fix the degenerate amplitude, phase and phase gradient: unwrap the phases relative to antenna 0 along the
+    # shortest distances and remove the best fitting plane
+    amplitude = np.abs(gains)
+    phase = np.zeros(gains.shape)
+    for antenna, parent in _phase_tree(antennas):
+        phase[:, antenna] = phase[:, parent] + np.angle(gains[:, antenna] * np.conj(gains[:, parent]))
+    plane = np.column_stack((np.ones(n_antennas), antennas))
+    projection = plane @ np.linalg.pinv(plane)
+    gains = amplitude / amplitude.mean(axis=-1, keepdims=True) * np.exp(1j * (phase - phase @ projection.T))
+
+    # Visibilities of all groups (also those with one baseline) from the calibrated baselines
+    pair = gains[:, first] * np.conj(gains[:, second])
+    group = (np.conj(pair) * data) @ members / np.maximum(np.abs(pair)**2 @ members, np.finfo(float).tiny)
+    return (gains.reshape(shape + (n_antennas,)), group.reshape(shape + (n_groups,)), labels,
+            converged.reshape(shape), iterations.reshape(shape))
@@ -0,0 +1,138 @@
+# This script predicts the visibilities of a sky model of point sources for an antenna configuration.
+# The predicted visibilities have the same layout as the correlation products of the data acquisition scripts
+# (IQ_i * conj(IQ_j) as spectra over time for every baseline), so measured and predicted fringes can be
+# overlaid or subtracted directly. All times, channels, baselines and sources are calculated in chunks of
+# array operations to limit the memory.
+
+# Importing all the necessary modules and packages
+import numpy as np
+from station import load_positions          # Import the preset loader
+from UV import baseline_vectors             # Import batched baseline calculation
+from PSF import speed_of_light              # Speed of light in m/s
+from uvw_tracks import site_latitude, site_longitude, julian_date, local_sidereal_time, enu_to_xyz
+from station import center_frequency, sample_rate, channels     # Settings of the receivers
+from station import calibrators, channel_frequencies            # Calibrator sources and channel axis
+
+# Define system-specific variables
+fov = 79.06                         # Field of view of the antennas in degrees
+max_elements = 2**22                # Maximal number of times x sources x baselines x channels calculated at once
+
+
+'''
+baseline_pairs
+This function returns the antenna pair of every baseline, in the order of UV.baseline_vectors.
+The visibility of baseline (i, j) corresponds to IQ_i * conj(IQ_j).
+Inputs:
+    n_antennas: Number of antennas
+Outputs:
+    pairs: NumPy array of shape (n_baselines, 2) with the antenna indices of every baseline
+'''
+
+def baseline_pairs(n_antennas):
+    return np.stack(np.triu_indices(n_antennas, k=1), axis=-1)
+
+
+'''
+source_directions
+This function calculates the direction of every source at every time as unit vectors in the equatorial frame of
+the site (see uvw_tracks.enu_to_xyz). Precession since J2000 and refraction are neglected.
+Inputs:
+    ra: Right ascension of the sources in degrees (array of length n_sources)
+    dec: Declination of the sources in degrees (array of length n_sources)
+    times: Observation times in UTC (see uvw_tracks.julian_date)
+    longitude: Longitude of the site in degrees (default: site longitude)
+Outputs:
+    directions: NumPy array of shape (n_times, n_sources, 3)
+'''
+
+def source_directions(ra, dec, times, longitude=site_longitude):
+    ra, dec = np.deg2rad(np.atleast_1d(ra)), np.deg2rad(np.atleast_1d(dec))
+    hour_angle = local_sidereal_time(np.atleast_1d(julian_date(times)), longitude)[:, None] - ra
+    return np.stack((np.cos(dec) * np.cos(hour_angle),
+                     -np.cos(dec) * np.sin(hour_angle),
+                     np.broadcast_to(np.sin(dec), hour_angle.shape)), axis=-1)
+
+
+'''
+primary_beam
+This function calculates the gain of the antennas towards every source, as a Gaussian beam with a full width at
+half maximum equal to the field of view. Sources below the horizon get a gain of zero.
+Inputs:
+    directions: NumPy array of shape (n_times, n_sources, 3) (see source_directions)
+    pointing: (altitude, azimuth) of the beam center in degrees (default: zenith)
+    fov: Field of view of the antennas in degrees (default: 79.06)
+    latitude: Latitude of the site in degrees (default: site latitude)
+Outputs:
+    gain: NumPy array of shape (n_times, n_sources)
+'''
+
+def primary_beam(directions, pointing=(90.0, 0.0), fov=fov, latitude=site_latitude):
+    alt, az = np.deg2rad(pointing[0]), np.deg2rad(pointing[1])
+    center = enu_to_xyz([np.cos(alt) * np.sin(az), np.cos(alt) * np.cos(az), np.sin(alt)], latitude)
+    zenith = enu_to_xyz([0.0, 0.0, 1.0], latitude)
+
+    distance = np.arccos(np.clip(directions @ center, -1, 1))
+    gain = np.exp(-4 * np.log(2) * (distance / np.deg2rad(fov))**2)
+    return np.where(directions @ zenith > 0, gain, 0.0)
+
+
+'''
+predict_visibilities
+This function predicts the visibilities of point sources for every baseline, time and channel.
+The geometric delay of every source gives the phase 2 pi f (b . s) / c of baseline b = x_i - x_j
+towards direction s, the sign convention of IQ_i * conj(IQ_j). Instrumental delays and gains are not included.
+Inputs:
+    antennas: A NumPy array of shape (n_antennas, 2) or (n_antennas, 3) with local antenna positions in meters
+              (east, north[, up]), e.g. from Array.load_positions
+    ra, dec: Position of the sources in degrees (arrays of length n_sources)
+    flux: Flux of the sources in Jy (array of length n_sources)
+    times: Observation times in UTC (see uvw_tracks.julian_date), e.g. one per spectrum
+    frequencies: Frequency of every channel in Hz (default: channel_frequencies())
+    pointing: (altitude, azimuth) of the beam center in degrees, None to leave out the primary beam (default: zenith)
+    fov: Field of view of the antennas in degrees (default: 79.06)
+    latitude, longitude: Position of the site in degrees (default: site position)
+Outputs:
+    visibilities: Complex NumPy array of shape (n_baselines, n_times, n_channels) in Jy.
+                  visibilities[b] has the same layout as IQ_i * conj(IQ_j) of baseline b = (i, j) (see baseline_pairs).
+'''
+
+def predict_visibilities(antennas, ra, dec, flux, times, frequencies=None, pointing=(90.0, 0.0), fov=fov,
+                         latitude=site_latitude, longitude=site_longitude):
+    frequencies = channel_frequencies() if frequencies is None else np.atleast_1d(np.asarray(frequencies, dtype=np.float64))
+    baselines = baseline_vectors(enu_to_xyz(antennas, latitude))               # (n_baselines, 3)
+    directions = source_directions(ra, dec, times, longitude)                  # (n_times, n_sources, 3)
+
+    # Apparent flux of every source at every time
+    flux = np.broadcast_to(np.asarray(flux, dtype=np.float64), directions.shape[1:2])
+    apparent = flux * (primary_beam(directions, pointing, fov, latitude) if pointing is not None
+                       else (directions @ enu_to_xyz([0.0, 0.0, 1.0], latitude) > 0))
+
+    # Path difference of every baseline towards every source in wavelengths per Hz, (n_times, n_sources, n_baselines)
+    delay = np.einsum('tsk,bk->tsb', directions, baselines) / speed_of_light
+
+    n_times, n_sources, n_baselines = delay.shape
+    chunk = max(1, max_elements // max(1, n_sources * n_baselines * len(frequencies)))
+    visibilities = np.empty((n_baselines, n_times, len(frequencies)), dtype=np.complex64)
+    for start in range(0, n_times, chunk):
+        phase = 2 * np.pi * delay[start:start + chunk, :, :, None] * frequencies          # (t, s, b, f)
+        fringes = np.einsum('ts,tsbf->btf', apparent[start:start + chunk], np.exp(1j * phase))
+        visibilities[:, start:start + chunk] = fringes
+    return visibilities
+
+
+'''
+predict_calibrators
+This function predicts the visibilities of the calibrator sources (Cassiopeia A, Cygnus A and Virgo A)
+for the antenna configuration of a preset CSV file.
+Inputs:
+    filename: CSV file with the antenna positions (see Array.load_positions)
+    times: Observation times in UTC (see uvw_tracks.julian_date)
+    names: Names of the calibrators to include (default: all calibrators)
+    The remaining inputs are passed to predict_visibilities.
+Outputs:
+    visibilities: Complex NumPy array of shape (n_baselines, n_times, n_channels) (see predict_visibilities)
+'''
+
+def predict_calibrators(filename, times, names=None, **kwargs):
+    ra, dec, flux = np.array([calibrators[name] for name in (names or calibrators)]).T
+    return predict_visibilities(load_positions(filename), ra, dec, flux, times, **kwargs)
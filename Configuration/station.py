@@ -0,0 +1,56 @@
+# This script holds the settings of the station that are shared by all folders: the site, the receivers, the
+# calibrator sources and the format of the antenna position files. It only depends on NumPy, so the scripts in
+# the Data acquisition and astronomical requirement folders can load this file by its path (see
+# Data acquisition/observatory.py) without adding the Configuration folder to sys.path.
+
+# Importing all the necessary modules and packages
+import csv
+import numpy as np
+
+# Define system-specific variables
+site_latitude = 52.167357           # Latitude of the observing site in degrees (Leiden)
+site_longitude = 4.461547           # Longitude of the observing site in degrees (east positive)
+site_height = 10                    # Height of the observing site in meters
+center_frequency = 1.42e9           # Center frequency of the receivers in Hz
+sample_rate = 2.5e6                 # Sample rate of the receivers in samples per second
+channels = 512                      # Number of channels of the polyphase filterbank
+position_header = ['Antenna', 'X (m)', 'Y (m)']    # Header row of the position CSV files
+
+# Calibrator sources of Plot_sources_position.ipynb: (RA in degrees, Dec in degrees, approximate flux at 1.4 GHz in Jy)
+calibrators = {
+    'Cassiopeia A': (350.86642, 58.81178, 1800.0),
+    'Cygnus A': (299.86817, 40.73392, 1598.0),
+    'Virgo A': (187.70592, 12.39111, 210.0),
+}
+
+
+'''
+channel_frequencies
+This function calculates the sky frequency of every channel, in the same way as the frequency axis of the
+correlation plots (from center - sample_rate/2 to center + sample_rate/2).
+Inputs:
+    center: Center frequency in Hz (default: 1.42 GHz)
+    rate: Sample rate in samples per second (default: 2.5 MS/s)
+    n_channels: Number of channels (default: 512)
+Outputs:
+    frequencies: NumPy array with the frequency of every channel in Hz
+'''
+
+def channel_frequencies(center=center_frequency, rate=sample_rate, n_channels=channels):
+    return np.linspace(center - rate / 2, center + rate / 2, n_channels)
+
+
+'''
+load_positions
+This function loads antenna positions from a CSV file in the format of the presets of the optimizer GUI.
+Inputs:
+    filename: The name of the CSV file to read.
+Outputs:
+    antennas: A 2D NumPy array of shape (n_antennas, 2), where each row represents the (x, y) coordinates of an antenna.
+'''
+
+def load_positions(filename):
+    with open(filename, 'r') as file:
+        reader = csv.reader(file)
+        next(reader)            # Skip header
+        return np.array([[float(row[1]), float(row[2])] for row in reader if row])
@@ -0,0 +1,125 @@
+# This script calculates the uvw tracks of all baselines while the Earth rotates during an observation.
+# The ground layout only gives the instantaneous baselines (see UV.py); the sky rotation moves every
+# baseline along an ellipse in the uv plane, which fills the uv plane during multi-hour observations.
+# All time steps and baselines are handled in one vectorized computation.
+
+# Importing all the necessary modules and packages
+import numpy as np
+from UV import baseline_vectors             # Import batched baseline calculation
+from PSF import speed_of_light              # Speed of light in m/s
+from station import site_latitude, site_longitude, site_height     # Position of the observing site (Leiden)
+
+
+'''
+julian_date
+This function converts observation times to Julian dates (UTC).
+Inputs:
+    times: Times as NumPy datetime64 values, ISO strings (e.g. "2024-11-01T12:30:00") or an Astropy Time object
+Outputs:
+    jd: NumPy array with the Julian date of every time
+'''
+
+def julian_date(times):
+    if hasattr(times, 'jd'):
+        return np.asarray(times.utc.jd, dtype=np.float64)
+    times = np.asarray(times, dtype='datetime64[ns]')
+    return (times - np.datetime64('1970-01-01T00:00:00', 'ns')) / np.timedelta64(1, 'D') + 2440587.5
+
+
+'''
+time_grid
+This function creates evenly spaced observation times.
+Inputs:
+    start: Start time of the observation (UTC, datetime64 or ISO string)
+    stop: End time of the observation (UTC, datetime64 or ISO string)
+    n_steps: Number of time steps, including start and stop
+Outputs:
+    times: NumPy array of datetime64 values
+'''
+
+def time_grid(start, stop, n_steps):
+    start = np.datetime64(start, 'ns')
+    stop = np.datetime64(stop, 'ns')
+    offsets = np.linspace(0, (stop - start) / np.timedelta64(1, 'ns'), n_steps).astype('timedelta64[ns]')
+    return start + offsets
+
+
+'''
+local_sidereal_time
+This function calculates the local mean sidereal time (GMST from the IAU 1982 expression plus the longitude).
+The difference between UT1 and UTC (below one second) is neglected.
+Inputs:
+    jd: Julian dates (UTC)
+    longitude: Longitude of the site in degrees, east positive (default: site longitude)
+Outputs:
+    lst: NumPy array with the local sidereal time in radians (between 0 and 2*pi)
+'''
+
+def local_sidereal_time(jd, longitude=site_longitude):
+    d = np.asarray(jd, dtype=np.float64) - 2451545.0
+    t = d / 36525
+    gmst = 280.46061837 + 360.98564736629 * d + 0.000387933 * t**2 - t**3 / 38710000
+    return np.deg2rad((gmst + longitude) % 360)
+
+
+'''
+enu_to_xyz
+This function converts local antenna positions (east, north, up) to the equatorial frame of the site,
+with X towards hour angle 0 on the equator, Y towards the east and Z towards the celestial pole.
+Inputs:
+    antennas: A NumPy array of shape (..., n_antennas, 2) with (east, north) or (..., n_antennas, 3) with
+              (east, north, up) coordinates in meters. The x and y coordinates of the presets are east and north.
+    latitude: Latitude of the site in degrees (default: site latitude)
+Outputs:
+    xyz: A NumPy array of shape (..., n_antennas, 3) with the equatorial coordinates in meters
+'''
+
+def enu_to_xyz(antennas, latitude=site_latitude):
+    antennas = np.asarray(antennas, dtype=np.float64)
+    east, north = antennas[..., 0], antennas[..., 1]
+    up = antennas[..., 2] if antennas.shape[-1] > 2 else np.zeros_like(east)
+
+    lat = np.deg2rad(latitude)
+    return np.stack((-np.sin(lat) * north + np.cos(lat) * up,
+                     east,
+                     np.cos(lat) * north + np.sin(lat) * up), axis=-1)
+
+
+'''
+uvw_tracks
+This function calculates the uvw coordinates of all baselines at all time steps for a source at (RA, Dec).
+Baselines are ordered in the same way as UV.baseline_vectors. The result can be used directly as uv for the
+imaging and PSF functions, e.g. psf_image(tracks[..., :2].reshape(-1, 2), num_pix, frequency) for the
+PSF of the whole observation.
+Inputs:
+    antennas: A NumPy array of shape (n_antennas, 2) or (n_antennas, 3) with local antenna positions in meters
+    ra: Right ascension of the source in degrees
+    dec: Declination of the source in degrees
+    times: Observation times in UTC (see julian_date), e.g. from time_grid
+    latitude: Latitude of the site in degrees (default: site latitude)
+    longitude: Longitude of the site in degrees (default: site longitude)
+    frequency: Observation frequency in Hz to return the coordinates in wavelengths, None for meters (default: None)
+Outputs:
+    uvw: A NumPy array of shape (n_times, n_baselines, 3) with the (u, v, w) coordinates of every baseline
+'''
+
+def uvw_tracks(antennas, ra, dec, times, latitude=site_latitude, longitude=site_longitude, frequency=None):
+    # Baselines in the equatorial frame, (n_baselines, 3)
+    baselines = baseline_vectors(enu_to_xyz(antennas, latitude))
+
+    # Hour angle of the source at every time step
+    hour_angle = local_sidereal_time(julian_date(times), longitude) - np.deg2rad(ra)
+    sin_h, cos_h = np.sin(hour_angle), np.cos(hour_angle)
+    sin_d, cos_d = np.sin(np.deg2rad(dec)), np.cos(np.deg2rad(dec))
+
+    # Rotation from the equatorial frame to the uvw frame of the source for every time step, (n_times, 3, 3)
+    rotation = np.stack((np.stack((sin_h, cos_h, np.zeros_like(sin_h)), axis=-1),
+                         np.stack((-sin_d * cos_h, sin_d * sin_h, np.full_like(sin_h, cos_d)), axis=-1),
+                         np.stack((cos_d * cos_h, -cos_d * sin_h, np.full_like(sin_h, sin_d)), axis=-1)), axis=-2)
+
+    uvw = np.einsum('tij,bj->tbi', rotation, baselines)
+
+    if frequency is not None:
+        f = frequency.to_value('Hz') if hasattr(frequency, 'unit') else float(frequency)
+        uvw *= f / speed_of_light
+    return uvw
@@ -32,6 +32,7 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 import osmosdr
 import time
+from health_monitor import ReceiverStats, HealthTap, HealthMonitor
 
 
 
@@ -132,6 +133,11 @@ class Interferometer(gr.top_block, Qt.QWidget):
         self.blocks_file_sink_0 = blocks.file_sink(gr.sizeof_gr_complex*1, 'Airspy2', False)
         self.blocks_file_sink_0.set_unbuffered(False)
 
+        # Health monitor: statistics of every receiver stream in 'health.jsonl' and on http://127.0.0.1:8090/
+        self.health_stats = [ReceiverStats(name, samp_rate) for name in ('Airspy0', 'Airspy1', 'Airspy2')]
+        self.health_tap_0, self.health_tap_1, self.health_tap_2 = [HealthTap(stats) for stats in self.health_stats]
+        self.health_monitor = HealthMonitor(self.health_stats, 'health.jsonl', port=8090)
+
 
         ##################################################
         # Connections
@@ -139,6 +145,9 @@ class Interferometer(gr.top_block, Qt.QWidget):
         self.connect((self.osmosdr_source_0, 0), (self.blocks_file_sink_0_0, 0))
         self.connect((self.osmosdr_source_0_0, 0), (self.blocks_file_sink_0, 0))
         self.connect((self.osmosdr_source_0_1, 0), (self.blocks_file_sink_0_1, 0))
+        self.connect((self.osmosdr_source_0, 0), (self.health_tap_0, 0))
+        self.connect((self.osmosdr_source_0_1, 0), (self.health_tap_1, 0))
+        self.connect((self.osmosdr_source_0_0, 0), (self.health_tap_2, 0))
 
 
     def closeEvent(self, event):
@@ -146,6 +155,7 @@ class Interferometer(gr.top_block, Qt.QWidget):
         self.settings.setValue("geometry", self.saveGeometry())
         self.stop()
         self.wait()
+        self.health_monitor.stop()
 
         event.accept()
 
@@ -186,12 +196,14 @@ def main(top_block_cls=Interferometer, options=None):
     tb = top_block_cls()
 
     tb.start()
+    tb.health_monitor.start()
 
     tb.show()
 
     def sig_handler(sig=None, frame=None):
         tb.stop()
         tb.wait()
+        tb.health_monitor.stop()
 
         Qt.QApplication.quit()
 
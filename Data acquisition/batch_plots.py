@@ -0,0 +1,197 @@
+# This script renders series of diagnostic plots off-screen on a pool of processes.
+# The computation submits already computed (decimated) arrays and continues directly; the worker processes draw them with the
+# Agg backend and save them as PNG files. Every worker creates each kind of figure once and only updates the
+# data of its artists for the next frame, instead of building a new figure with colorbars for every frame.
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from rfi_flagger import masked_average
+
+max_rows = 1024                     # Rows of a waterfall that are sent to a worker (more than the PNG has pixels)
+
+# Figures of the current worker process, created once per kind of plot
+_figures = {}
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+'''
+PlotPool
+This class renders plots on worker processes without blocking the computation.
+At most max_pending frames are waiting or being drawn at the same time; submit only waits when this limit is
+reached, so the memory of the queued arrays stays bounded (submit decimated frames, see decimate). Errors of a worker
+are raised by submit or close. Scripts create the pool in main() behind if __name__ == "__main__": with the spawn
+and forkserver start methods every worker imports the main module again.
+Inputs:
+    workers: Number of worker processes (default: number of CPUs, at most 4)
+    max_pending: Maximal number of frames in the queue (default: 2 per worker)
+'''
+
+class PlotPool:
+
+    def __init__(self, workers=None, max_pending=None):
+        workers = workers or min(os.cpu_count() or 1, 4)
+        self.max_pending = max_pending or 2 * workers
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self._pending = deque()
+
+    '''
+    submit
+    This function queues one frame.
+    Inputs:
+        render: Render function of the frame (e.g. render_waterfalls or render_phase)
+        filename: PNG file to write
+        **data: Arrays and labels of the frame, passed to the render function
+    '''
+
+    def submit(self, render, filename, **data):
+        while len(self._pending) >= self.max_pending:
+            self._pending.popleft().result()
+        self._pending.append(self._pool.submit(render, filename, **data))
+
+    def close(self):
+        while self._pending:
+            self._pending.popleft().result()
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+'''
+decimate
+This function averages groups of rows of a waterfall so that at most max_rows rows are left, before it is sent to a
+worker process (every submitted array is pickled to the worker). Complex crosscorrelations are averaged as phasors,
+so the phase of the result is the phase of the mean crosscorrelation. With an RFI mask, flagged samples are left out
+of the averages (see rfi_flagger.masked_average); rows without unflagged samples become NaN.
+Inputs:
+    data: NumPy array of shape (n_spectra, n_channels)
+    max_rows: Maximal number of rows of the result (default: 1024)
+    mask: Boolean NumPy array with the shape of data, True for flagged samples, None for no flags (default: None)
+Outputs:
+    decimated: NumPy array of shape (n_rows, n_channels), float32 or complex64
+'''
+
+def decimate(data, max_rows=max_rows, mask=None):
+    factor = -(-len(data) // max_rows)
+    n_rows = len(data) // factor
+    groups = data[:n_rows * factor].reshape(n_rows, factor, -1)
+    if mask is None:
+        decimated = groups.mean(axis=1)
+    else:
+        decimated, _ = masked_average(groups, mask[:n_rows * factor].reshape(n_rows, factor, -1), axis=1)
+    return decimated.astype(np.complex64 if np.iscomplexobj(decimated) else np.float32)
+
+
+'''
+_save
+This function writes a figure, creating the folder of the file if needed.
+'''
+
+def _save(fig, filename, dpi):
+    folder = os.path.dirname(filename)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+
+
+'''
+render_waterfalls
+This function draws the phase and magnitude of a crosscorrelation as two waterfalls with colorbars
+(the plots of resistor_correlation.py).
+Inputs:
+    filename: PNG file to write
+    cross_ang: Phase of the crosscorrelation, NumPy array of shape (n_spectra, n_channels)
+    cross_abs: Magnitude of the crosscorrelation, NumPy array of shape (n_spectra, n_channels)
+    extent: Extent of the waterfalls [f_min, f_max, t_min, t_max]
+    aspect: Aspect ratio of the waterfalls
+    title: Title of the figure
+    vmax: Upper color limit of the magnitude, None for twice the mean magnitude (default: None)
+    dpi: Resolution of the PNG file (default: 150)
+'''
+
+def render_waterfalls(filename, cross_ang, cross_abs, extent, aspect, title, vmax=None, dpi=150):
+    if 'waterfalls' not in _figures:
+        import matplotlib.pyplot as plt
+        fig, (ax1, ax2) = plt.subplots(1, 2, sharey=True)
+        empty = np.zeros((2, 2))
+        p1 = ax1.imshow(empty, vmin=-np.pi, vmax=np.pi, cmap='seismic', origin='lower', interpolation='none')
+        p2 = ax2.imshow(empty, origin='lower')
+        plt.colorbar(p1, ax=ax1)
+        plt.colorbar(p2, ax=ax2)
+        ax1.set_xlabel("Frequency (MHz)")
+        ax2.set_xlabel("Frequency (MHz)")
+        ax1.set_ylabel("Time (s)")
+        ax1.set_title("Phase")
+        ax2.set_title("Magnitude")
+        _figures['waterfalls'] = fig, ax1, ax2, p1, p2, fig.suptitle('')
+
+    fig, ax1, ax2, p1, p2, suptitle = _figures['waterfalls']
+    for ax, image, data in ((ax1, p1, cross_ang), (ax2, p2, cross_abs)):
+        image.set_data(data)
+        image.set_extent(extent)
+        ax.set_aspect(aspect)
+    p2.set_clim(0, 2 * np.mean(cross_abs) if vmax is None else vmax)
+    suptitle.set_text(title)
+    fig.tight_layout()
+    _save(fig, filename, dpi)
+
+
+'''
+render_phase
+This function draws the phase of a crosscorrelation as a waterfall next to the mean phase per channel
+(the plots of complex_phase_shifting.py).
+Inputs:
+    filename: PNG file to write
+    cross_ang: Phase of the crosscorrelation, NumPy array of shape (n_spectra, n_channels)
+    x: Frequency of every channel in MHz
+    extent: Extent of the waterfall [f_min, f_max, t_min, t_max]
+    aspect: Aspect ratio of the waterfall
+    title: Title of the figure
+    markers: Frequencies in MHz that are marked with vertical lines (default: none)
+    mean_phase: Mean phase per channel of the full resolution data, None for the mean of cross_ang (default: None)
+    dpi: Resolution of the PNG file (default: 200)
+'''
+
+def render_phase(filename, cross_ang, x, extent, aspect, title, markers=(), mean_phase=None, dpi=200):
+    if 'phase' not in _figures:
+        import matplotlib.pyplot as plt
+        fig, (ax1, ax2) = plt.subplots(1, 2)
+        p1 = ax1.imshow(np.zeros((2, 2)), vmin=-np.pi, vmax=np.pi, cmap='seismic', origin='lower')
+        line, = ax2.plot([], [])
+        plt.colorbar(p1, ax=ax1)
+        ax1.set_xlabel("Frequency (MHz)")
+        ax2.set_xlabel("Frequency (MHz)")
+        ax1.set_ylabel("Time (s)")
+        ax1.set_title("Phase")
+        ax2.set_title("Mean phase")
+        ax1.tick_params(rotation=30)
+        ax2.tick_params(rotation=30)
+        _figures['phase'] = fig, ax1, ax2, p1, line, [], fig.suptitle('')
+
+    fig, ax1, ax2, p1, line, marker_lines, suptitle = _figures['phase']
+    p1.set_data(cross_ang)
+    p1.set_extent(extent)
+    ax1.set_aspect(aspect)
+    line.set_data(x, cross_ang.mean(axis=0) if mean_phase is None else mean_phase)
+    ax2.relim()
+    ax2.autoscale_view()
+
+    # Replace the marker lines of the previous frame
+    while marker_lines:
+        marker_lines.pop().remove()
+    for f in markers:
+        marker_lines.extend((ax1.axvline(f, color='red', ls='--'), ax2.axvline(f, color='red', ls='--')))
+
+    suptitle.set_text(title)
+    fig.tight_layout()
+    _save(fig, filename, dpi)
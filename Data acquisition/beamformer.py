@@ -0,0 +1,189 @@
+# This script forms tied-array beams from the channelized spectra of all receivers.
+# Every channel of every antenna is multiplied with a complex weight that removes the geometric delay towards the
+# pointing (and optionally the solved gain of gain_calibration.py), and the weighted antennas are summed into one or
+# more beams. For every spectrum and channel this is a small matrix product (1 x n_antennas) @ (n_antennas x n_beams);
+# all of them are done as one batched matrix product per chunk of spectra, and the chunks run on a pool of threads
+# (NumPy releases the GIL in the matrix product). The power of the beams is averaged into streaming power spectra.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord, AltAz
+from observatory import site, calibrators, channel_frequencies, load_positions
+
+speed_of_light = 299792458.0                # Speed of light in m/s
+n_average = 256                             # Number of spectra per integration of the power spectra
+chunk = 64                                  # Number of spectra per batched matrix product
+
+
+'''
+source_pointing
+This function calculates the altitude and azimuth of sources at a time, to point beams at them.
+Inputs:
+    names: Names of calibrators (see observatory.calibrators), or (RA, Dec) pairs in degrees
+    time: Time (UTC) of the pointing, e.g. the time of the first spectrum of a block
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    pointings: NumPy array of shape (n_sources, 2) with the altitude and azimuth in degrees
+'''
+
+def source_pointing(names, time, location=site):
+    radec = np.array([calibrators[name][:2] if isinstance(name, str) else name for name in names], dtype=np.float64)
+    altaz = SkyCoord(ra=radec[:, 0] * u.deg, dec=radec[:, 1] * u.deg, frame='icrs').transform_to(
+        AltAz(obstime=Time(time), location=location))
+    return np.stack((altaz.alt.deg, altaz.az.deg), axis=-1)
+
+
+'''
+steering_weights
+This function calculates the complex weight of every antenna and channel for every beam.
+A plane wave from direction s arrives with phase 2 pi f (x_i . s) / c at antenna i, the sign convention of the
+crosscorrelations IQ_i * conj(IQ_j) (see sky_model.predict_visibilities); the weight removes this phase, so the
+antennas add up in phase towards s. The weights of a beam are normalized to a sum of one.
+Inputs:
+    antennas: NumPy array of shape (n_antennas, 2) or (n_antennas, 3) with the positions in meters (east, north[, up])
+    pointings: Altitude and azimuth in degrees of every beam, shape (n_beams, 2)
+    frequencies: Sky frequency of every channel in Hz (default: channel_frequencies())
+    gains: Complex gains of shape (n_channels, n_antennas) from gain_calibration.solve_gains to correct for,
+           None for no correction (default: None)
+Outputs:
+    weights: Complex NumPy array of shape (n_beams, n_channels, n_antennas)
+'''
+
+def steering_weights(antennas, pointings, frequencies=None, gains=None):
+    antennas = np.asarray(antennas, dtype=np.float64)
+    frequencies = channel_frequencies() if frequencies is None else np.asarray(frequencies, dtype=np.float64)
+    alt, az = np.deg2rad(np.atleast_2d(pointings)).T
+    directions = np.stack((np.cos(alt) * np.sin(az), np.cos(alt) * np.cos(az), np.sin(alt)), axis=-1)
+
+    delay = directions[:, :antennas.shape[1]] @ antennas.T / speed_of_light          # (n_beams, n_antennas)
+    weights = np.exp(-2j * np.pi * frequencies[None, :, None] * delay[:, None, :]) / len(antennas)
+    if gains is not None:
+        weights = weights / np.asarray(gains)[None]
+    return weights.astype(np.complex64)
+
+
+'''
+Beamformer
+This class forms beams from blocks of channelized spectra and averages their power into power spectra.
+Spectra that do not fill a whole integration are kept until the next block arrives.
+Inputs:
+    antennas: NumPy array of shape (n_antennas, 2) with the antenna positions in meters, or a preset CSV file
+              (see observatory.load_positions; the order of the rows is the order of the receivers)
+    pointings: Altitude and azimuth in degrees of every beam, shape (n_beams, 2) (see source_pointing)
+    frequencies: Sky frequency of every channel in Hz (default: channel_frequencies())
+    gains: Complex gains of shape (n_channels, n_antennas) to correct for, None for no correction (default: None)
+    n_average: Number of spectra per integration of the power spectra (default: 256, about 52 ms)
+    workers: Number of threads, None for the number of CPUs (default: None)
+    chunk: Number of spectra per batched matrix product (default: 64)
+'''
+
+class Beamformer:
+
+    def __init__(self, antennas, pointings, frequencies=None, gains=None, n_average=n_average, workers=None,
+                 chunk=chunk):
+        self.antennas = load_positions(antennas) if isinstance(antennas, str) else np.asarray(antennas)
+        self.frequencies = channel_frequencies() if frequencies is None else np.asarray(frequencies)
+        self.gains = gains
+        self.n_average = n_average
+        self.chunk = chunk
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self._carry = None                      # Power of the spectra that do not fill an integration yet
+        self.point(pointings)
+
+    '''
+    point
+    This function changes the pointing of the beams, e.g. to follow sources between blocks.
+    Spectra of the old pointing that do not fill an integration yet are dropped, so an integration never mixes
+    two pointings (or numbers of beams).
+    Inputs:
+        pointings: Altitude and azimuth in degrees of every beam, shape (n_beams, 2)
+    '''
+
+    def point(self, pointings):
+        weights = steering_weights(self.antennas, pointings, self.frequencies, self.gains)
+        self.n_beams = len(weights)
+        # (n_channels, n_antennas, n_beams) for the product of the spectra (..., n_channels, 1, n_antennas)
+        self._weights = np.ascontiguousarray(weights.transpose(1, 2, 0))
+        self._carry = None
+
+    def _chunks(self, n_spectra):
+        return [slice(start, min(start + self.chunk, n_spectra)) for start in range(0, n_spectra, self.chunk)]
+
+    def _voltages(self, spectra, part):
+        block = spectra[:, part].transpose(1, 2, 0)[:, :, None, :]                 # (n, n_channels, 1, n_antennas)
+        return np.matmul(block, self._weights)[:, :, 0, :]                       # (n, n_channels, n_beams)
+
+    '''
+    form
+    This function forms the beams of a block of spectra.
+    Inputs:
+        spectra: Complex NumPy array of shape (n_antennas, n_spectra, n_channels), e.g. the output of
+                 channelize_ppf_contiguous_block for every receiver
+    Outputs:
+        beams: Complex NumPy array of shape (n_beams, n_spectra, n_channels) with the channelized beam voltages
+    '''
+
+    def form(self, spectra):
+        beams = np.empty((spectra.shape[1], spectra.shape[2], self.n_beams), dtype=np.complex64)
+
+        def work(part):
+            beams[part] = self._voltages(spectra, part)
+
+        list(self._pool.map(work, self._chunks(spectra.shape[1])))
+        return beams.transpose(2, 0, 1)
+
+    '''
+    power
+    This function forms the beams of a block of spectra and averages their power.
+    Inputs:
+        spectra: Complex NumPy array of shape (n_antennas, n_spectra, n_channels)
+    Outputs:
+        power: NumPy array of shape (n_beams, n_integrations, n_channels) with the power spectra of the
+               integrations completed by this block (n_integrations can be 0)
+    '''
+
+    def power(self, spectra):
+        power = np.empty((spectra.shape[1], spectra.shape[2], self.n_beams), dtype=np.float32)
+
+        def work(part):
+            voltages = self._voltages(spectra, part)
+            power[part] = voltages.real**2 + voltages.imag**2
+
+        list(self._pool.map(work, self._chunks(spectra.shape[1])))
+
+        if self._carry is not None:
+            power = np.concatenate((self._carry, power))
+        used = len(power) // self.n_average * self.n_average
+        self._carry = power[used:]
+        integrated = power[:used].reshape(-1, self.n_average, *power.shape[1:]).mean(axis=1)
+        return integrated.transpose(2, 0, 1)
+
+    '''
+    stream
+    This function forms the power spectra of a stream of blocks.
+    Inputs:
+        blocks: Iterable of complex NumPy arrays of shape (n_antennas, n_spectra, n_channels)
+        pointings: Function that returns the pointings for the index of a block (e.g. with source_pointing to
+                   follow sources), None to keep the current pointing (default: None)
+    Outputs:
+        Generator of the power spectra of every block, shape (n_beams, n_integrations, n_channels)
+    '''
+
+    def stream(self, blocks, pointings=None):
+        for index, block in enumerate(blocks):
+            if pointings is not None:
+                self.point(pointings(index))
+            yield self.power(block)
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
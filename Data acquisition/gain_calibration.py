@@ -0,0 +1,128 @@
+# This script solves for the complex gain of every antenna (receiver) from channelized cross-correlations.
+# The visibilities are modelled as V_ij = g_i M_ij conj(g_j) with a sky model M (a point source or the
+# predicted visibilities of sky_model.py). The gains are found with an alternating least-squares solver
+# (StEFCal) that updates all antennas, channels and integrations at once, and can be applied as a
+# streaming correction to the channelized spectra.
+
+import numpy as np
+
+channels = 512
+max_iter = 100
+tolerance = 1e-6
+
+
+'''
+visibility_matrix
+This function correlates the channelized spectra of all antennas into a visibility matrix per integration.
+Inputs:
+    spectra: Complex NumPy array of shape (n_antennas, n_spectra, n_channels), e.g. the output of
+             channelize_ppf_contiguous_block for every receiver
+    n_average: Number of spectra averaged per integration
+Outputs:
+    visibilities: Complex NumPy array of shape (n_integrations, n_channels, n_antennas, n_antennas)
+                  with visibilities[t, f, i, j] the average of IQ_i * conj(IQ_j)
+'''
+
+def visibility_matrix(spectra, n_average):
+    spectra = np.asarray(spectra)
+    n_antennas, n_spectra, n_channels = spectra.shape
+    n_integrations = n_spectra // n_average
+    blocks = spectra[:, :n_integrations * n_average].reshape(n_antennas, n_integrations, n_average, n_channels)
+    return np.einsum('aisf,bisf->ifab', blocks, np.conj(blocks)) / n_average
+
+
+'''
+model_matrix
+This function converts visibilities per baseline (the layout of sky_model.predict_visibilities) to visibility
+matrices. Autocorrelations are not modelled and are set to zero.
+Inputs:
+    visibilities: Complex NumPy array of shape (n_baselines, n_times, n_channels) for the baselines (i, j), i < j
+    n_antennas: Number of antennas
+Outputs:
+    model: Complex NumPy array of shape (n_times, n_channels, n_antennas, n_antennas)
+'''
+
+def model_matrix(visibilities, n_antennas):
+    visibilities = np.asarray(visibilities)
+    i, j = np.triu_indices(n_antennas, k=1)
+    model = np.zeros(visibilities.shape[1:] + (n_antennas, n_antennas), dtype=np.complex128)
+    model[..., i, j] = np.moveaxis(visibilities, 0, -1)
+    model[..., j, i] = np.conj(model[..., i, j])
+    return model
+
+
+'''
+solve_gains
+This function solves V_ij = g_i M_ij conj(g_j) for the gains of all antennas with alternating least squares.
+Every iteration updates the gain of each antenna with the other gains fixed, for all channels and integrations
+at once; every second iteration averages the new and old gains, which makes the iteration converge (StEFCal).
+Autocorrelations are not used. The phase of the first antenna is set to zero.
+Inputs:
+    visibilities: Complex NumPy array of shape (..., n_antennas, n_antennas), e.g. (n_integrations, n_channels, n, n)
+    model: Model visibilities with the same shape, None for a point source at the phase center (all ones)
+    max_iter: Maximal number of iterations (default: 100)
+    tolerance: Relative change of the gains at which the iteration stops (default: 1e-6)
+Outputs:
+    gains: Complex NumPy array of shape (..., n_antennas)
+'''
+
+def solve_gains(visibilities, model=None, max_iter=max_iter, tolerance=tolerance):
+    visibilities = np.asarray(visibilities, dtype=np.complex128)
+    n_antennas = visibilities.shape[-1]
+    model = np.ones_like(visibilities) if model is None else np.broadcast_to(model, visibilities.shape)
+
+    off_diagonal = ~np.eye(n_antennas, dtype=bool)
+    visibilities = visibilities * off_diagonal
+    model = model * off_diagonal
+
+    gains = np.ones(visibilities.shape[:-1], dtype=np.complex128)
+    for iteration in range(max_iter):
+        # z_ip = g_i M_ip, then g_p = sum_i conj(V_ip) z_ip / sum_i |z_ip|^2
+        z = gains[..., :, None] * model
+        power = np.einsum('...ip,...ip->...p', np.conj(z), z).real
+        new_gains = np.einsum('...ip,...ip->...p', np.conj(visibilities), z) / np.where(power > 0, power, 1)
+
+        if iteration % 2 == 1:
+            new_gains = (new_gains + gains) / 2
+
+        change = np.abs(new_gains - gains).max() / max(np.abs(new_gains).max(), np.finfo(float).tiny)
+        gains = new_gains
+        if change < tolerance:
+            break
+
+    # Reference the phases to the first antenna
+    reference = gains[..., :1]
+    return gains * np.conj(reference) / np.where(np.abs(reference) > 0, np.abs(reference), 1)
+
+
+'''
+apply_gains
+This function corrects visibility matrices with solved gains: V_ij / (g_i conj(g_j)).
+Inputs:
+    visibilities: Complex NumPy array of shape (..., n_antennas, n_antennas)
+    gains: Complex NumPy array of shape (..., n_antennas)
+Outputs:
+    corrected: Complex NumPy array with the same shape as visibilities
+'''
+
+def apply_gains(visibilities, gains):
+    return visibilities / (gains[..., :, None] * np.conj(gains[..., None, :]))
+
+
+'''
+correct_stream
+This function applies gains to a stream of channelized spectra, block by block and in place.
+Correcting every voltage spectrum with 1/g_i corrects all products IQ_i * conj(IQ_j) computed from them.
+Inputs:
+    blocks: Iterable of complex NumPy arrays of shape (n_antennas, n_spectra, n_channels)
+    gains: Complex NumPy array of shape (n_channels, n_antennas) for fixed gains, or a function that returns
+           the gains for the index of a block (e.g. to use the solution of the nearest integration)
+Outputs:
+    Generator of the corrected blocks (the same arrays as the input blocks)
+'''
+
+def correct_stream(blocks, gains):
+    for index, block in enumerate(blocks):
+        g = gains(index) if callable(gains) else gains
+        block /= np.asarray(g).T[:, None, :].astype(block.dtype)
+        yield block
@@ -0,0 +1,279 @@
+# This script monitors the health of the receivers while Interferometer.py records.
+# A tap block on every receiver stream keeps cheap running statistics of the samples: the RMS power, the fraction of
+# clipped samples, the DC offset and the number of samples compared to the expected sample rate (dropped samples of
+# an overflow show up as a lower rate). A background thread publishes the statistics every second to a rolling
+# JSON lines file and, optionally, to a small HTTP endpoint on localhost. The tap only reads the samples that the
+# file sinks also read, so the recording itself is not changed.
+
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from gnuradio import gr
+
+sample_rate = 2.5e6
+clip_level = 0.99                   # Samples with |I| or |Q| above this level (full scale 1) count as clipped
+max_samples = 65536                 # Maximal number of samples per work call that are used for the statistics
+interval = 1.0                      # Time between two published records in seconds
+max_lines = 3600                    # Number of records in the metrics file before it is rotated
+
+# Limits for the warnings of a record
+max_clip_fraction = 1e-3
+min_power_dbfs = -60.0              # e.g. a dead bias-tee (no LNA power)
+max_dc_ratio = 0.1                  # DC offset relative to the RMS amplitude
+min_rate_ratio = 0.98               # Received samples relative to the expected sample rate (GNU Radio hands over
+                                    # the samples in buffers of some milliseconds, so one interval varies slightly)
+
+
+'''
+ReceiverStats
+This class accumulates the statistics of one receiver stream. update is called from the GNU Radio thread of the
+tap block, snapshot from the publishing thread; the lock is only held to add to or swap the accumulators.
+Inputs:
+    name: Name of the receiver (e.g. the name of its file sink)
+    samp_rate: Expected sample rate in samples per second (default: 2.5 MS/s)
+    clip_level: Clipping level of |I| and |Q| (default: 0.99)
+    max_samples: Maximal number of samples per update that are used for the statistics; all samples are counted
+                 for the sample rate (default: 65536)
+'''
+
+class ReceiverStats:
+
+    def __init__(self, name, samp_rate=sample_rate, clip_level=clip_level, max_samples=max_samples):
+        self.name = name
+        self.samp_rate = samp_rate
+        self.clip_level = clip_level
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._start = None                  # Time and number of samples of the first update
+        self._first = 0
+        self._total = 0
+        self._last = (None, 0)              # Time and total of the previous snapshot
+        self._reset()
+
+    def _reset(self):
+        self._analysed = 0
+        self._power = 0.0
+        self._dc = 0j
+        self._clipped = 0
+        self._peak = 0.0
+
+    '''
+    update
+    This function adds a block of samples.
+    Inputs:
+        samples: Complex NumPy array (complex64) with the samples of the receiver
+    '''
+
+    def update(self, samples):
+        now = time.monotonic()
+        used = samples[:self.max_samples]
+        iq = used.view(np.float32)
+        power = float(np.vdot(used, used).real)
+        dc = complex(used.sum(dtype=np.complex128))
+        clipped = int(np.count_nonzero(np.abs(iq) >= self.clip_level))
+        peak = float(np.abs(iq).max(initial=0))
+
+        with self._lock:
+            if self._start is None:
+                self._start, self._first = now, len(samples)
+            self._total += len(samples)
+            self._analysed += len(used)
+            self._power += power
+            self._dc += dc
+            self._clipped += clipped
+            self._peak = max(self._peak, peak)
+
+    '''
+    snapshot
+    This function returns the statistics since the previous snapshot and starts a new interval.
+    Outputs:
+        record: Dictionary with
+            'samples': Number of samples received in the interval
+            'rate': Received samples per second in the interval
+            'rate_ratio': Received over expected samples in the interval
+            'missing': Expected minus received samples since the first block (dropped samples)
+            'rms': RMS amplitude, 'power_dbfs': Power in dB relative to full scale
+            'clip_fraction': Fraction of the I and Q values at or above the clipping level
+            'dc_i', 'dc_q': DC offset of I and Q, 'peak': Largest |I| or |Q|
+            'warnings': List of the limits that were exceeded
+    '''
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            start, first, total = self._start, self._first, self._total
+            analysed, power, dc, clipped, peak = self._analysed, self._power, self._dc, self._clipped, self._peak
+            self._reset()
+
+        last_time, last_total = self._last
+        self._last = (now, total)
+        record = {'samples': total - last_total,
+                  'rate': (total - last_total) / (now - last_time) if last_time is not None else None,
+                  'rate_ratio': None, 'missing': None, 'rms': None, 'power_dbfs': None, 'clip_fraction': None,
+                  'dc_i': None, 'dc_q': None, 'peak': peak, 'warnings': []}
+
+        if record['rate'] is not None:
+            record['rate_ratio'] = record['rate'] / self.samp_rate
+
+        # Samples after the first block compared to the time since the first block
+        if start is not None and now > start:
+            record['missing'] = int(max((now - start) * self.samp_rate - (total - first), 0))
+        if analysed:
+            mean_power = power / analysed
+            record['rms'] = float(np.sqrt(mean_power))
+            record['power_dbfs'] = float(10 * np.log10(max(mean_power, np.finfo(float).tiny)))
+            record['clip_fraction'] = clipped / (2 * analysed)
+            record['dc_i'], record['dc_q'] = dc.real / analysed, dc.imag / analysed
+
+        record['warnings'] = check_limits(record, last_time is not None)
+        return record
+
+
+'''
+check_limits
+This function lists the limits that a record of ReceiverStats.snapshot exceeds.
+Inputs:
+    record: Record of one receiver
+    running: False for the first record, which has no previous interval yet
+Outputs:
+    warnings: List of strings
+'''
+
+def check_limits(record, running=True):
+    if running and record['samples'] == 0:
+        return ['no samples']
+    found = []
+    if record['clip_fraction'] is not None and record['clip_fraction'] > max_clip_fraction:
+        found.append('clipping')
+    if record['power_dbfs'] is not None and record['power_dbfs'] < min_power_dbfs:
+        found.append('low power')
+    if record['rms'] and np.hypot(record['dc_i'], record['dc_q']) > max_dc_ratio * record['rms']:
+        found.append('dc offset')
+    if running and record['rate_ratio'] is not None and record['rate_ratio'] < min_rate_ratio:
+        found.append('dropped samples')
+    return found
+
+
+'''
+HealthTap
+This GNU Radio sink block passes the samples of one receiver stream to a ReceiverStats. It is connected to the same
+output as the file sink, so it sees every sample without copying the stream.
+Inputs:
+    stats: ReceiverStats of the receiver
+'''
+
+class HealthTap(gr.sync_block):
+
+    def __init__(self, stats):
+        gr.sync_block.__init__(self, name=f'health_tap_{stats.name}', in_sig=[np.complex64], out_sig=None)
+        self.stats = stats
+
+    def work(self, input_items, output_items):
+        self.stats.update(input_items[0])
+        return len(input_items[0])
+
+
+'''
+HealthMonitor
+This class publishes the statistics of all receivers from a background thread.
+Every interval one JSON record is appended to the metrics file; when the file has max_lines records it is moved to
+<filename>.1 and a new file is started, so at most two files are kept. With a port, the latest record is also served
+as JSON on http://127.0.0.1:<port>/ (e.g. curl http://127.0.0.1:8090/).
+Inputs:
+    receivers: List of ReceiverStats
+    filename: Metrics file, None for no file (default: 'health.jsonl')
+    port: Port of the HTTP endpoint, None for no endpoint (default: None)
+    interval: Time between two records in seconds (default: 1)
+    max_lines: Number of records per metrics file (default: 3600)
+    verbose: Print the warnings (default: True)
+'''
+
+class HealthMonitor:
+
+    def __init__(self, receivers, filename='health.jsonl', port=None, interval=interval, max_lines=max_lines,
+                 verbose=True):
+        self.receivers = receivers
+        self.filename = filename
+        self.port = port
+        self.interval = interval
+        self.max_lines = max_lines
+        self.verbose = verbose
+        self.latest = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self._lines = 0
+
+    def start(self):
+        if self.port is not None:
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.port), _handler(self))
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        for receiver in self.receivers:
+            receiver.snapshot()
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    '''
+    publish
+    This function takes a snapshot of every receiver and writes it to the metrics file and the endpoint.
+    '''
+
+    def publish(self):
+        record = {'time': time.time(), 'receivers': {receiver.name: receiver.snapshot() for receiver in self.receivers}}
+        self.latest = record
+
+        if self.filename is not None:
+            if self._lines >= self.max_lines:
+                os.replace(self.filename, self.filename + '.1')
+                self._lines = 0
+            with open(self.filename, 'w' if self._lines == 0 else 'a') as file:
+                file.write(json.dumps(record) + '\n')
+            self._lines += 1
+
+        if self.verbose:
+            for name, stats in record['receivers'].items():
+                if stats['warnings']:
+                    print(f"{time.strftime('%H:%M:%S')} {name}: {', '.join(stats['warnings'])}")
+        return record
+
+
+def _handler(monitor):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            body = json.dumps(monitor.latest).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,193 @@
+# This script turns integrated auto- and cross-spectra into 21 cm (HI) line profiles.
+# Every integration gets the velocity correction from the topocentric frame to the local standard of rest (LSR)
+# for its pointing and time; all integrations are then re-gridded onto one common LSR velocity axis in a single
+# vectorized interpolation, a polynomial baseline is removed outside of the line window and the integrations are
+# averaged into one line profile.
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord, AltAz, Galactic, LSR
+from observatory import site, channel_frequencies
+
+rest_freq = 1420.405751768e6                # Rest frequency of the HI line in Hz
+speed_of_light = 299792.458                 # Speed of light in km/s
+line_width = 150.0                          # Largest half width of the line window in km/s
+baseline_fraction = 0.5                     # Part of each side of the band (from the rest frequency to the band edge)
+                                            # that is kept outside of the line window for the baseline fit
+
+
+'''
+radio_velocity
+This function converts frequencies to velocities with the radio convention, v = c * (1 - f / f_rest).
+Inputs:
+    frequencies: Frequencies in Hz
+Outputs:
+    velocities: Velocities in km/s (positive away from the observer)
+'''
+
+def radio_velocity(frequencies, rest=rest_freq):
+    return speed_of_light * (1 - np.asarray(frequencies) / rest)
+
+
+'''
+pointing_radec
+This function converts a fixed pointing of the (tilted) array to right ascension and declination at every time.
+Inputs:
+    alt, az: Altitude and azimuth of the pointing in degrees
+    times: Astropy Time (UTC) of every integration
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    ra, dec: NumPy arrays with the right ascension and declination in degrees at every time
+'''
+
+def pointing_radec(alt, az, times, location=site):
+    times = Time(times)
+    n = times.size
+    icrs = SkyCoord(alt=np.full(n, alt) * u.deg, az=np.full(n, az) * u.deg,
+                    frame=AltAz(obstime=times.reshape(n), location=location)).icrs
+    return icrs.ra.deg, icrs.dec.deg
+
+
+'''
+lsr_correction
+This function calculates the velocity that has to be added to topocentric radial velocities to get LSR velocities:
+the barycentric correction (rotation and orbit of the Earth) plus the motion of the Sun with respect to the LSR
+projected on the line of sight. All times (and pointings) are handled in one call.
+Inputs:
+    ra, dec: Pointing in degrees, one value or one value per time
+    times: Astropy Time (UTC) of every integration
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    correction: NumPy array with the correction in km/s for every time
+'''
+
+def lsr_correction(ra, dec, times, location=site):
+    times = Time(times)
+    n = times.size
+    pointing = SkyCoord(ra=np.broadcast_to(ra, n) * u.deg, dec=np.broadcast_to(dec, n) * u.deg, frame='icrs')
+
+    barycentric = pointing.radial_velocity_correction('barycentric', obstime=times.reshape(n), location=location)
+
+    # Solar motion with respect to the LSR (the default of Astropy's LSR frame) along the line of sight
+    v_sun = LSR().v_bary.xyz.to_value(u.km / u.s)
+    direction = pointing.transform_to(Galactic()).cartesian.xyz.value
+    return barycentric.to_value(u.km / u.s) + np.einsum('k,kn->n', v_sun, direction)
+
+
+'''
+regrid_velocity
+This function re-grids all integrations onto one velocity axis with linear interpolation in one vectorized pass.
+Because the channels are evenly spaced in frequency, each integration only shifts by its own velocity correction.
+Inputs:
+    spectra: NumPy array of shape (n_integrations, n_channels), real (auto-spectra) or complex (cross-spectra)
+    velocities: Topocentric velocity of every channel in km/s (see radio_velocity)
+    correction: LSR correction of every integration in km/s (see lsr_correction)
+    grid: Common LSR velocity axis in km/s, None for the range covered by all integrations with the
+          channel spacing (default: None)
+Outputs:
+    grid: Common velocity axis in km/s (increasing)
+    regridded: NumPy array of shape (n_integrations, len(grid))
+'''
+
+def regrid_velocity(spectra, velocities, correction, grid=None):
+    spectra = np.asarray(spectra)
+    velocities = np.asarray(velocities, dtype=np.float64)
+    correction = np.asarray(correction, dtype=np.float64).reshape(-1, 1)
+
+    # Sort the channels by increasing velocity (velocity decreases with frequency)
+    order = np.argsort(velocities)
+    velocities, spectra = velocities[order], spectra[:, order]
+    step = np.mean(np.diff(velocities))
+
+    if grid is None:
+        low, high = velocities[0] + correction.max(), velocities[-1] + correction.min()
+        grid = low + step * np.arange(int(np.floor((high - low) / step)) + 1)
+
+    # Fractional channel index of every grid velocity in every integration
+    index = (grid[None, :] - correction - velocities[0]) / step
+    valid = (index >= 0) & (index <= len(velocities) - 1)
+    index = np.clip(index, 0, len(velocities) - 1)
+    lower = np.minimum(np.floor(index).astype(np.intp), len(velocities) - 2)
+    weight = index - lower
+
+    regridded = ((1 - weight) * np.take_along_axis(spectra, lower, axis=1)
+                 + weight * np.take_along_axis(spectra, lower + 1, axis=1))
+    return grid, np.where(valid, regridded, np.nan)
+
+
+'''
+default_line_window
+This function chooses a line window around the rest frequency (0 km/s) that fits in the band.
+The receivers are not tuned to the rest frequency (1.42 GHz gives about -178 to +349 km/s), so a fixed window of
++-150 km/s would leave only a few channels on the negative side for the baseline fit. The window is symmetric and
+at most +-line_width, but never wider than (1 - baseline_fraction) of the shorter side of the band.
+Inputs:
+    grid: Velocity axis in km/s (increasing)
+    width: Largest half width of the window in km/s (default: 150)
+Outputs:
+    line_window: Velocity range (v_min, v_max) in km/s
+'''
+
+def default_line_window(grid, width=line_width):
+    half = max(min(width, (1 - baseline_fraction) * min(-grid[0], grid[-1])), 0.0)
+    return -half, half
+
+
+'''
+remove_baseline
+This function removes a polynomial baseline from every integration, fitted outside the line window.
+The same design matrix is used for all integrations, so all fits are one least-squares solution.
+Inputs:
+    grid: Velocity axis in km/s
+    spectra: NumPy array of shape (n_integrations, len(grid))
+    line_window: Velocity range (v_min, v_max) in km/s of the line, excluded from the fit, None for
+                 default_line_window(grid) (default: None)
+    order: Order of the polynomial (default: 3)
+Outputs:
+    corrected: NumPy array with the same shape as spectra
+'''
+
+def remove_baseline(grid, spectra, line_window=None, order=3):
+    if line_window is None:
+        line_window = default_line_window(grid)
+
+    x = (grid - grid.mean()) / np.ptp(grid)
+    design = np.vander(x, order + 1)
+    fit = ~((grid >= line_window[0]) & (grid <= line_window[1])) & np.all(np.isfinite(spectra), axis=0)
+
+    coefficients, *_ = np.linalg.lstsq(design[fit], spectra[:, fit].T, rcond=None)
+    return spectra - (design @ coefficients).T
+
+
+'''
+line_profile
+This function reduces integrated spectra to an averaged HI line profile in the LSR frame.
+Inputs:
+    spectra: NumPy array of shape (n_integrations, n_channels), auto-spectra or cross-spectra
+    times: Astropy Time (UTC) of every integration
+    ra, dec: Pointing in degrees (one value or one value per integration); or None with alt and az
+    alt, az: Fixed pointing of the array in degrees, used when ra and dec are None
+    frequencies: Sky frequency of every channel in Hz (default: channel_frequencies())
+    reference: Bandpass of the receiver channels, shape (n_channels,) (e.g. of a terminated or cold sky
+               observation), divided out of every integration before the re-gridding, None to skip (default: None)
+    line_window, order: Line window and polynomial order of the baseline fit (see remove_baseline)
+Outputs:
+    grid: LSR velocity axis in km/s
+    profile: Averaged line profile on the velocity axis
+    regridded: Baseline-corrected integrations on the velocity axis, shape (n_integrations, len(grid))
+'''
+
+def line_profile(spectra, times, ra=None, dec=None, alt=None, az=None, frequencies=None, location=site,
+                 line_window=None, order=3, reference=None):
+    if ra is None or dec is None:
+        ra, dec = pointing_radec(alt, az, times, location)
+    frequencies = channel_frequencies() if frequencies is None else frequencies
+
+    if reference is not None:
+        spectra = np.asarray(spectra) / np.asarray(reference)       # The bandpass is fixed to the channels
+
+    correction = lsr_correction(ra, dec, times, location)
+    grid, regridded = regrid_velocity(spectra, radio_velocity(frequencies), correction)
+    regridded = remove_baseline(grid, regridded, line_window, order)
+    return grid, regridded.mean(axis=0), regridded
@@ -0,0 +1,24 @@
+# This script holds the settings of the receivers and the site that are shared by the data acquisition scripts.
+# The channel axis, the site, the calibrator sources and the antenna position format are defined once in
+# Configuration/station.py. That file only depends on NumPy, so it is loaded here by its path; sys.path is not
+# changed, so no module of the Configuration folder can shadow a module of this folder.
+
+import os
+import importlib.util
+
+import astropy.units as u
+from astropy.coordinates import EarthLocation
+
+_station_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Configuration', 'station.py')
+_spec = importlib.util.spec_from_file_location('station', _station_file)
+station = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(station)
+
+load_positions = station.load_positions                     # Antenna positions of a preset CSV file
+channel_frequencies = station.channel_frequencies           # Sky frequency of every channel
+calibrators = station.calibrators                           # Position and flux of the calibrator sources
+channels, sample_rate, center_freq = station.channels, station.sample_rate, station.center_frequency
+
+# Observer's location (latitude, longitude, height)
+site = EarthLocation(lat=station.site_latitude * u.deg, lon=station.site_longitude * u.deg,
+                     height=station.site_height * u.m)
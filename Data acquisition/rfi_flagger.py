@@ -0,0 +1,165 @@
+# This script flags radio frequency interference (RFI) in channelized data while it streams in.
+# Every sample is compared with robust running statistics per channel (median and MAD of the amplitude),
+# and the remaining samples of every block of a channel are checked with the spectral kurtosis estimator.
+# The result is a boolean mask (or a bit-packed copy of it) that the correlation and averaging functions below
+# use without copying the data.
+
+import numpy as np
+
+channels = 512
+threshold = 5.5                     # Samples further than threshold * sigma from the running median are flagged
+sk_threshold = 6.0                  # Blocks with a spectral kurtosis further than sk_threshold * sigma from 1 are flagged
+memory = 0.9                        # Weight of the previous running statistics when a new block is added
+mad_to_sigma = 1.4826               # Ratio between the standard deviation and the MAD of a normal distribution
+block_size = 1024                   # Number of spectra per block of flag_spectra
+
+
+'''
+RFIFlagger
+This class flags RFI in consecutive blocks of channelized spectra.
+The running median and MAD of the amplitude per channel are updated with the median and MAD of every block
+(an exponential average, so a short burst of RFI does not move them), and only unflagged blocks update them.
+With the default thresholds, about 1e-5 of the samples of white Gaussian noise are flagged with blocks of 1024
+spectra and about 2e-5 with blocks of 256 spectra. The spectral kurtosis of short blocks has a long upper tail,
+so shorter blocks flag more clean channels (about 6e-5 of the samples with 128 spectra).
+Inputs:
+    n_channels: Number of channels (default: 512)
+    threshold: Flagging threshold for single samples in units of the robust standard deviation (default: 5.5)
+    sk_threshold: Flagging threshold for the spectral kurtosis of a block of a channel (default: 6)
+    memory: Weight of the previous running statistics (default: 0.9)
+'''
+
+class RFIFlagger:
+
+    def __init__(self, n_channels=channels, threshold=threshold, sk_threshold=sk_threshold, memory=memory):
+        self.threshold = threshold
+        self.sk_threshold = sk_threshold
+        self.memory = memory
+        self.median = np.full(n_channels, np.nan, dtype=np.float32)     # Running median of the amplitude per channel
+        self.mad = np.full(n_channels, np.nan, dtype=np.float32)        # Running MAD of the amplitude per channel
+
+    '''
+    flag
+    This function flags one block of spectra and updates the running statistics.
+    Inputs:
+        spectra: Complex NumPy array of shape (n_spectra, n_channels), e.g. from channelize_ppf_contiguous_block
+    Outputs:
+        mask: Boolean NumPy array of shape (n_spectra, n_channels), True for flagged samples
+    '''
+
+    def flag(self, spectra):
+        power = np.abs(spectra)**2
+        amplitude = np.sqrt(power)
+
+        block_median = np.median(amplitude, axis=0)
+        block_mad = np.median(np.abs(amplitude - block_median), axis=0)
+
+        # The first block starts the running statistics
+        first = np.isnan(self.median)
+        self.median[first], self.mad[first] = block_median[first], block_mad[first]
+
+        # Single samples far from the running median of the amplitude
+        sigma = mad_to_sigma * np.maximum(self.mad, np.finfo(np.float32).tiny)
+        mask = np.abs(amplitude - self.median) > self.threshold * sigma
+
+        # Spectral kurtosis of the remaining samples of every channel, 1 for Gaussian noise,
+        # with a variance of 4 n^2 / ((n - 1) (n + 2) (n + 3)) for n samples
+        valid = ~mask
+        n = np.count_nonzero(valid, axis=0)
+        s1 = np.sum(power, axis=0, where=valid)
+        s2 = np.sum(power**2, axis=0, where=valid)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sk = (n + 1) / (n - 1) * (n * s2 / s1**2 - 1)
+            bad_channels = ~(np.abs(sk - 1) <= self.sk_threshold * np.sqrt(4 * n**2 / ((n - 1) * (n + 2) * (n + 3))))
+        mask |= bad_channels
+
+        # Update the running statistics with the clean channels of this block
+        clean = ~bad_channels & ~first
+        self.median[clean] = self.memory * self.median[clean] + (1 - self.memory) * block_median[clean]
+        self.mad[clean] = self.memory * self.mad[clean] + (1 - self.memory) * block_mad[clean]
+        return mask
+
+    '''
+    flag_stream
+    This function flags a stream of blocks.
+    Inputs:
+        blocks: Iterable of complex NumPy arrays of shape (n_spectra, n_channels)
+    Outputs:
+        Generator of (block, mask) pairs
+    '''
+
+    def flag_stream(self, blocks):
+        for block in blocks:
+            yield block, self.flag(block)
+
+
+'''
+flag_spectra
+This function flags a whole recording of channelized spectra by streaming it block by block through a new RFIFlagger.
+Inputs:
+    spectra: Complex NumPy array of shape (n_spectra, n_channels)
+    block: Number of spectra per block (default: 1024)
+    The remaining inputs are passed to RFIFlagger.
+Outputs:
+    mask: Boolean NumPy array of shape (n_spectra, n_channels), True for flagged samples
+'''
+
+def flag_spectra(spectra, block=block_size, **kwargs):
+    flagger = RFIFlagger(spectra.shape[1], **kwargs)
+    mask = np.empty(spectra.shape, dtype=bool)
+    for start in range(0, len(spectra), block):
+        mask[start:start + block] = flagger.flag(spectra[start:start + block])
+    return mask
+
+
+'''
+pack_mask, unpack_mask
+These functions convert a boolean mask to a bit-packed mask (8 samples per byte along the channel axis) and back.
+A 512 channel spectrum needs 64 bytes of mask.
+'''
+
+def pack_mask(mask):
+    return np.packbits(mask, axis=-1)
+
+
+def unpack_mask(packed, n_channels=channels):
+    return np.unpackbits(packed, axis=-1, count=n_channels).astype(bool)
+
+
+'''
+masked_cross
+This function calculates the crosscorrelation IQ0 * conj(IQ1) and sets flagged samples to zero.
+The product is written to out, so no temporary arrays are created.
+Inputs:
+    IQ0, IQ1: Complex NumPy arrays of shape (n_spectra, n_channels)
+    mask: Boolean mask of shape (n_spectra, n_channels) (e.g. the union of the masks of both receivers)
+    out: Complex NumPy array for the result, None to allocate a new one (default: None)
+Outputs:
+    cross: Complex NumPy array of shape (n_spectra, n_channels)
+'''
+
+def masked_cross(IQ0, IQ1, mask, out=None):
+    out = np.conjugate(IQ1, out=out)
+    np.multiply(out, IQ0, out=out)
+    np.copyto(out, 0, where=mask)
+    return out
+
+
+'''
+masked_average
+This function averages data over an axis while skipping flagged samples, without copying the data.
+Inputs:
+    data: NumPy array, e.g. crosscorrelations or powers of shape (n_spectra, n_channels)
+    mask: Boolean mask with the same shape as data
+    axis: Axis to average over (default: 0, the time axis)
+Outputs:
+    average: Average of the unflagged samples (NaN where all samples are flagged)
+    count: Number of unflagged samples
+'''
+
+def masked_average(data, mask, axis=0):
+    valid = ~mask
+    count = np.count_nonzero(valid, axis=axis)
+    total = np.sum(data, axis=axis, where=valid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count, count
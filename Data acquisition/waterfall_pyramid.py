@@ -0,0 +1,209 @@
+# This script stores long crosscorrelation waterfalls as a multi-resolution pyramid on disk.
+# While the data streams in, every level averages `factor` rows of the level below: the mean and the maximum of the
+# magnitude and the mean phasor (circular mean) of the phase. Displaying any time and frequency range then only reads
+# the coarsest level that still has enough rows for the screen, and the running statistics of the magnitude give the
+# color scale without another pass over the data.
+
+import os
+import json
+import numpy as np
+
+channels = 512
+sample_rate = 2.5e6
+factor = 4                          # Number of rows of a level that are combined into one row of the next level
+max_levels = 12
+products = ('mean', 'max', 'phasor')
+
+
+def _level_file(path, level, product):
+    return os.path.join(path, f'level_{level}_{product}.bin')
+
+
+def _dtype(product):
+    return np.complex64 if product == 'phasor' else np.float32
+
+
+# Level 0 has one spectrum per row, so its maximum is the mean and is read from the 'mean' file
+def _stored(level, product):
+    return 'mean' if level == 0 and product == 'max' else product
+
+
+'''
+WaterfallPyramid
+This class writes the pyramid of a crosscorrelation waterfall block by block.
+Level 0 has one row per spectrum; level k has one row per factor**k spectra. Rows that do not fill a whole group
+yet are kept in memory until the next block arrives. Level 0 stores no 'max' file, since it equals the 'mean'.
+Inputs:
+    path: Folder of the pyramid (created if needed, existing pyramid files are overwritten)
+    n_channels: Number of channels (default: 512)
+    factor: Decimation factor between two levels (default: 4)
+    levels: Number of levels (default: 12, enough for factor**11 spectra per row)
+    spectrum_time: Duration of one spectrum in seconds (default: 512 / 2.5 MS/s)
+    freq: Frequency range [f_min, f_max] in MHz of the channels (default: 1420 -+ 1.25 MHz)
+'''
+
+class WaterfallPyramid:
+
+    def __init__(self, path, n_channels=channels, factor=factor, levels=max_levels,
+                 spectrum_time=channels / sample_rate, freq=(1420 - 1.25, 1420 + 1.25)):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = {'n_channels': n_channels, 'factor': factor, 'levels': levels, 'spectrum_time': spectrum_time,
+                     'freq': list(freq), 'rows': [0] * levels, 'count': 0, 'sum': 0.0}
+        self._files = {(level, product): open(_level_file(path, level, product), 'wb')
+                       for level in range(levels) for product in products if _stored(level, product) == product}
+        self._carry = [None] * levels           # Rows of every level that do not fill a group yet
+
+    '''
+    append
+    This function adds a block of crosscorrelations to every level of the pyramid.
+    Inputs:
+        cross: Complex NumPy array of shape (n_spectra, n_channels), e.g. IQ0 * np.conj(IQ1)
+    '''
+
+    def append(self, cross):
+        magnitude = np.abs(cross).astype(np.float32)
+        phasor = (cross / np.where(magnitude > 0, magnitude, 1)).astype(np.complex64)
+
+        # Running statistics of the magnitude for the color scale
+        self.meta['count'] += magnitude.size
+        self.meta['sum'] += float(magnitude.sum(dtype=np.float64))
+
+        self._add(0, {'mean': magnitude, 'phasor': phasor})
+
+    def _add(self, level, rows):
+        self._write(level, rows)
+        if level + 1 >= self.meta['levels']:
+            return
+
+        # Join with the rows left over from the previous block and combine whole groups
+        carry = self._carry[level]
+        if carry is not None:
+            rows = {product: np.concatenate((carry[product], rows[product])) for product in rows}
+        n_groups = len(rows['mean']) // self.meta['factor']
+        used = n_groups * self.meta['factor']
+        self._carry[level] = {product: rows[product][used:] for product in rows}
+
+        if n_groups:
+            grouped = {product: rows[product][:used].reshape(n_groups, self.meta['factor'], -1)
+                       for product in rows}
+            maxima = grouped.get('max', grouped['mean'])
+            self._add(level + 1, {'mean': grouped['mean'].mean(axis=1), 'max': maxima.max(axis=1),
+                                  'phasor': grouped['phasor'].mean(axis=1)})
+
+    def _write(self, level, rows):
+        for product in rows:
+            np.ascontiguousarray(rows[product], dtype=_dtype(product)).tofile(self._files[level, product])
+        self.meta['rows'][level] += len(rows['mean'])
+
+    def flush(self):
+        for file in self._files.values():
+            file.flush()
+        with open(os.path.join(self.path, 'meta.json'), 'w') as file:
+            json.dump(self.meta, file)
+
+    def close(self):
+        self.flush()
+        for file in self._files.values():
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+'''
+WaterfallView
+This class reads a pyramid written by WaterfallPyramid (also while it is still being written, after a flush).
+Inputs:
+    path: Folder of the pyramid
+'''
+
+class WaterfallView:
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as file:
+            self.meta = json.load(file)
+
+    @property
+    def duration(self):
+        return self.meta['rows'][0] * self.meta['spectrum_time']
+
+    def _level(self, level, product):
+        shape = (self.meta['rows'][level], self.meta['n_channels'])
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=_dtype(product))
+        return np.memmap(_level_file(self.path, level, product), dtype=_dtype(product), mode='r', shape=shape)
+
+    '''
+    color_limits
+    This function returns the color limits of the magnitude from the running statistics,
+    (0, 2 * mean) like the waterfall plots of resistor_correlation.py.
+    '''
+
+    def color_limits(self):
+        mean = self.meta['sum'] / max(self.meta['count'], 1)
+        return 0.0, 2 * mean
+
+    '''
+    view
+    This function reads a time and frequency range from the coarsest level that still has max_rows rows in the range.
+    Inputs:
+        t_range: Time range (t_start, t_stop) in seconds, None for the whole observation (default: None)
+        f_range: Frequency range (f_min, f_max) in MHz, None for all channels (default: None)
+        kind: 'magnitude' (mean), 'max' (maximum magnitude), 'phase' (circular mean) or 'coherence'
+              (length of the mean phasor) (default: 'magnitude')
+        max_rows: Minimal number of rows in the returned range, e.g. the height of the plot in pixels (default: 1000)
+    Outputs:
+        data: NumPy array of shape (n_rows, n_channels_in_range)
+        extent: Extent [f_min, f_max, t_start, t_stop] for imshow
+    '''
+
+    def view(self, t_range=None, f_range=None, kind='magnitude', max_rows=1000):
+        meta = self.meta
+        t_start, t_stop = t_range if t_range is not None else (0.0, self.duration)
+        first = max(int(np.floor(t_start / meta['spectrum_time'])), 0)
+        last = min(int(np.ceil(t_stop / meta['spectrum_time'])), meta['rows'][0])
+
+        # Coarsest level with at least max_rows rows in the range (or the finest level)
+        level = 0
+        while (level + 1 < meta['levels'] and meta['rows'][level + 1] > 0
+               and (last - first) // meta['factor']**(level + 1) >= max_rows):
+            level += 1
+        scale = meta['factor']**level
+        row_first, row_last = first // scale, min(-(-last // scale), meta['rows'][level])
+
+        f_min, f_max = meta['freq']
+        frequencies = np.linspace(f_min, f_max, meta['n_channels'])
+        c_first, c_last = 0, meta['n_channels']
+        if f_range is not None:
+            c_first, c_last = np.searchsorted(frequencies, f_range[0]), np.searchsorted(frequencies, f_range[1], 'right')
+
+        product = {'magnitude': 'mean', 'max': 'max', 'phase': 'phasor', 'coherence': 'phasor'}[kind]
+        data = self._level(level, _stored(level, product))[row_first:row_last, c_first:c_last]
+        if kind == 'phase':
+            data = np.angle(data)
+        elif kind == 'coherence':
+            data = np.abs(data)
+
+        channel_width = (f_max - f_min) / (meta['n_channels'] - 1)
+        extent = [frequencies[c_first] - channel_width / 2, frequencies[c_last - 1] + channel_width / 2,
+                  row_first * scale * meta['spectrum_time'], row_last * scale * meta['spectrum_time']]
+        return np.asarray(data), extent
+
+    '''
+    imshow
+    This function draws a range of the waterfall on a Matplotlib axis (see view for the inputs).
+    '''
+
+    def imshow(self, ax, t_range=None, f_range=None, kind='magnitude', max_rows=1000, **kwargs):
+        data, extent = self.view(t_range, f_range, kind, max_rows)
+        if kind == 'phase':
+            kwargs = {'vmin': -np.pi, 'vmax': np.pi, 'cmap': 'seismic', **kwargs}
+        elif kind in ('magnitude', 'max'):
+            vmin, vmax = self.color_limits()
+            kwargs = {'vmin': vmin, 'vmax': vmax, **kwargs}
+        return ax.imshow(data, extent=extent, aspect='auto', origin='lower', interpolation='none', **kwargs)
@@ -0,0 +1,197 @@
+# This script loads the NED source table once and keeps it as typed columns (name, RA, Dec, type, flux in Jy).
+# The parsed columns are cached next to the table and are parsed again only when the table changes.
+# A k-d tree on the unit vectors of the sources gives fast cone searches and beam queries,
+# so larger catalogs can be used without checking every row.
+
+# Importing all the necessary modules and packages
+import os
+import re
+import numpy as np
+import pandas as pd
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import AltAz, SkyCoord
+from sky_positions import site, station, _as_time
+
+# Define system-specific variables
+catalog_file = 'sources_brighter_than_11Jy_21cm.txt'    # NED table of sources brighter than 11 Jy at 21 cm
+header_rows = 21                    # Number of header lines of the NED table
+flux_limit = 11                     # Flux limit of the NED query in Jy
+fov = 79.06                         # Field of view of the antennas in degrees
+cache_version = 2                   # Version of the cached columns, raised when the parsing of the table changes
+
+# Flux in Jy at 21 cm of sources whose NED entry has no radio flux (e.g. Cygnus A is a galaxy with an optical magnitude)
+known_flux = {name: flux for name, (ra, dec, flux) in station.calibrators.items()}
+
+
+'''
+catalog_flux
+This function estimates the flux at 21 cm of every source in the NED table.
+For radio sources, supernova remnants and HII regions, NED gives the logarithm of the flux in mJy without a filter,
+e.g. "4.40" for 25 Jy. Optical and infrared magnitudes (with a filter letter) or empty entries have no radio flux;
+these sources get the flux limit of the query (11 Jy). Since the query only returned sources brighter than
+the flux limit, smaller estimates are raised to the limit as well. Sources in the known table (by default the
+calibrators of Configuration/station.py, e.g. Cygnus A with 1598 Jy) get their flux from that table, whatever their
+NED type.
+Inputs:
+    df: Pandas DataFrame with the columns 'Object Name', 'Type' and 'Magnitude and Filter' (e.g. the NED table)
+    default: Flux in Jy for sources without a radio flux (default: 11)
+    known: Dictionary of object name to flux in Jy that overrides the table (default: known_flux)
+Outputs:
+    flux: NumPy array with the flux of every source in Jy
+'''
+
+def catalog_flux(df, default=flux_limit, known=known_flux):
+    text = df['Magnitude and Filter'].fillna('').astype(str).str.strip()
+    radio = df['Type'].astype(str).str.strip().isin(['RadioS', 'SNR', 'HII'])
+    bare = text.map(lambda value: re.fullmatch(r'\d+\.\d*', value) is not None)
+
+    log_flux = pd.to_numeric(text.where(radio & bare), errors='coerce').to_numpy()
+    flux = 10**log_flux / 1000                      # mJy to Jy
+    flux = np.fmax(flux, default)                   # Missing fluxes (NaN) become the default
+
+    override = df['Object Name'].astype(str).str.strip().map(known).to_numpy(dtype=np.float64)
+    return np.where(np.isnan(override), flux, override)
+
+
+'''
+unit_vectors
+This function converts right ascension and declination to unit vectors on the celestial sphere.
+Inputs:
+    ra: Right ascension in degrees
+    dec: Declination in degrees
+Outputs:
+    vectors: NumPy array of shape (..., 3)
+'''
+
+def unit_vectors(ra, dec):
+    ra, dec = np.deg2rad(ra), np.deg2rad(dec)
+    return np.stack((np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)), axis=-1)
+
+
+'''
+Catalog
+This class holds the sources of a catalog as NumPy columns and answers spatial queries.
+Attributes:
+    name, type: NumPy string arrays with the object name and the NED type of every source
+    ra, dec: NumPy arrays with the position of every source in degrees
+    flux: NumPy array with the flux of every source in Jy (see catalog_flux)
+'''
+
+class Catalog:
+
+    def __init__(self, name, ra, dec, type, flux):
+        self.name = np.asarray(name, dtype=str)
+        self.ra = np.asarray(ra, dtype=np.float64)
+        self.dec = np.asarray(dec, dtype=np.float64)
+        self.type = np.asarray(type, dtype=str)
+        self.flux = np.asarray(flux, dtype=np.float64)
+        self._tree = None
+
+    def __len__(self):
+        return len(self.ra)
+
+    def __getitem__(self, index):
+        return Catalog(self.name[index], self.ra[index], self.dec[index], self.type[index], self.flux[index])
+
+    '''
+    to_frame
+    This function returns the catalog as a Pandas DataFrame with the column names of the NED table,
+    so it can be used with the plotting functions of Plot_sources_position.ipynb.
+    '''
+
+    def to_frame(self):
+        return pd.DataFrame({'Object Name': self.name, 'RA': self.ra, 'DEC': self.dec, 'Type': self.type,
+                             'Flux (Jy)': self.flux})
+
+    def brighter_than(self, threshold):
+        return self[self.flux >= threshold]
+
+    @property
+    def tree(self):
+        # The k-d tree is built on the first spatial query
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(unit_vectors(self.ra, self.dec))
+        return self._tree
+
+    '''
+    cone
+    This function finds all sources within a radius of one or more positions on the sky.
+    Inputs:
+        ra: Right ascension of the center in degrees (a number or an array)
+        dec: Declination of the center in degrees (a number or an array)
+        radius: Radius of the cone in degrees
+    Outputs:
+        index: NumPy array with the indices of the sources in the cone, sorted by flux (brightest first).
+               For an array of centers, a list with one index array per center.
+    '''
+
+    def cone(self, ra, dec, radius):
+        # Angular radius to the length of the chord between two unit vectors
+        chord = 2 * np.sin(np.deg2rad(min(radius, 180)) / 2)
+        found = self.tree.query_ball_point(unit_vectors(ra, dec), chord + 1e-12)
+
+        if np.ndim(ra) == 0 and np.ndim(dec) == 0:
+            return self._by_flux(found)
+        return [self._by_flux(index) for index in found]
+
+    def _by_flux(self, index):
+        index = np.asarray(index, dtype=np.intp)
+        return index[np.argsort(-self.flux[index], kind='stable')]
+
+    '''
+    beam
+    This function finds all sources inside the beam of the tilted array at one or more times.
+    Inputs:
+        alt_center: Altitude of the beam center in degrees
+        az_center: Azimuth of the beam center in degrees
+        times: Local time string(s) or Astropy Time in UTC (see sky_positions.altaz_grid)
+        fov: Field of view of the antennas in degrees (default: 79.06)
+        location: Observer's location (default: the site in Leiden)
+    Outputs:
+        index: NumPy array with the indices of the sources in the beam for a single time,
+               a list with one index array per time otherwise
+    '''
+
+    def beam(self, alt_center, az_center, times, fov=fov, location=site):
+        single = isinstance(times, str) or (isinstance(times, Time) and not times.shape)
+        times = _as_time(times)
+
+        center = SkyCoord(alt=np.full(len(times), alt_center) * u.deg, az=np.full(len(times), az_center) * u.deg,
+                          frame=AltAz(obstime=times, location=location)).icrs
+        found = self.cone(center.ra.deg, center.dec.deg, fov / 2)
+        return found[0] if single else found
+
+
+'''
+load_catalog
+This function loads a NED table as a Catalog. The parsed columns are cached in an .npz file next to the table,
+together with the size and modification time of the table and the cache version; the cache is only used while these
+still match.
+Inputs:
+    filename: Path of the NED table (default: sources_brighter_than_11Jy_21cm.txt)
+    cache: Path of the cache file, None for the table path with an .npz extension, False to disable the cache
+Outputs:
+    catalog: Catalog with all sources of the table
+'''
+
+def load_catalog(filename=catalog_file, cache=None):
+    if cache is None:
+        cache = os.path.splitext(filename)[0] + '.npz'
+    stat = os.stat(filename)
+    stamp = np.array([stat.st_size, stat.st_mtime_ns, cache_version], dtype=np.int64)
+
+    if cache and os.path.exists(cache):
+        with np.load(cache) as data:
+            if np.array_equal(data['stamp'], stamp):     # Also False for the shorter stamp of an older cache
+                return Catalog(data['name'], data['ra'], data['dec'], data['type'], data['flux'])
+
+    df = pd.read_csv(filename, skiprows=header_rows, sep='|')
+    catalog = Catalog(df['Object Name'].astype(str).str.strip(), df['RA'], df['DEC'],
+                      df['Type'].astype(str).str.strip(), catalog_flux(df))
+
+    if cache:
+        np.savez(cache, stamp=stamp, name=catalog.name, ra=catalog.ra, dec=catalog.dec, type=catalog.type,
+                 flux=catalog.flux)
+    return catalog
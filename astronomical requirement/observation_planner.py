@@ -0,0 +1,237 @@
+# This script plans observations with the tilted array.
+# Instead of reading two snapshot plots by eye, it calculates on a dense time grid when every bright source
+# is inside the tilted beam, above an elevation limit, far enough from the Sun and outside the galactic plane band.
+# All sources, times and candidate pointings are handled at once, and the result is a ranked list of
+# observation windows and a schedule with the best pointing for every time step.
+
+# Importing all the necessary modules and packages
+import argparse
+import numpy as np
+import pandas as pd
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+from sky_positions import site, utc_offset, time_grid, altaz_grid, sun_moon_altaz
+from catalog import load_catalog, catalog_file     # Import the cached source catalog
+
+# Define system-specific variables
+fov = 79.06                         # Field of view of the antennas in degrees
+min_flux = 11                       # Minimal flux of the planned sources in Jy (flux limit of the catalog)
+min_altitude = 20                   # Minimal altitude of the planned sources in degrees
+sun_distance = 30                   # Minimal angular distance between the sources and the Sun in degrees
+galactic_band = 15                  # Sources within +-galactic_band degrees of the galactic plane are skipped
+max_elements = 2**24                # Maximal number of pointings x sources x times calculated at once
+
+
+'''
+pointing_grid
+This function creates the candidate pointings of the tilted array.
+Inputs:
+    alt_centers: Altitudes of the beam center in degrees (default: 50 to 90 degrees in steps of 10 degrees)
+    az_centers: Azimuths of the beam center in degrees (default: 0 to 350 degrees in steps of 10 degrees)
+Outputs:
+    pointings: NumPy array of shape (n_pointings, 2) with the (altitude, azimuth) of every pointing in degrees.
+               Pointings towards the zenith are only included once.
+'''
+
+def pointing_grid(alt_centers=np.arange(50, 91, 10), az_centers=np.arange(0, 360, 10)):
+    alt, az = np.meshgrid(np.asarray(alt_centers, dtype=np.float64), np.asarray(az_centers, dtype=np.float64),
+                          indexing='ij')
+    pointings = np.stack((alt.ravel(), az.ravel()), axis=-1)
+    zenith = pointings[:, 0] >= 90
+    return np.concatenate((pointings[~zenith], [[90.0, 0.0]] if zenith.any() else np.empty((0, 2))))
+
+
+'''
+_unit_vectors
+This function converts altitudes and azimuths in degrees to (east, north, up) unit vectors.
+'''
+
+def _unit_vectors(alt, az):
+    alt, az = np.deg2rad(alt), np.deg2rad(az)
+    return np.stack((np.cos(alt) * np.sin(az), np.cos(alt) * np.cos(az), np.sin(alt)), axis=-1).astype(np.float32)
+
+
+'''
+visibility_mask
+This function calculates for every candidate pointing, source and time whether the source can be observed:
+inside the beam (within fov/2 of the pointing), above the elevation limit, far enough from the Sun and
+outside the galactic plane band.
+Inputs:
+    ra: Right ascension of the sources in degrees (array of length n_sources)
+    dec: Declination of the sources in degrees (array of length n_sources)
+    times: Astropy Time array in UTC (e.g. from sky_positions.time_grid)
+    pointings: NumPy array of shape (n_pointings, 2) with the (altitude, azimuth) of the pointings in degrees
+    fov: Field of view of the antennas in degrees (default: 79.06)
+    min_alt: Minimal altitude of the sources in degrees (default: 20)
+    min_sun_distance: Minimal angular distance between the sources and the Sun in degrees (default: 30)
+    band: Half width of the galactic plane band in degrees (default: 15)
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    mask: Boolean NumPy array of shape (n_pointings, n_sources, n_times)
+'''
+
+def visibility_mask(ra, dec, times, pointings, fov=fov, min_alt=min_altitude, min_sun_distance=sun_distance,
+                    band=galactic_band, location=site):
+    alt, az = altaz_grid(ra, dec, times, location)
+    sources = _unit_vectors(alt, az)                                        # (n_sources, n_times, 3)
+    sun = _unit_vectors(*sun_moon_altaz(times, location)['Sun'])            # (n_times, 3)
+
+    # Conditions that do not depend on the pointing, (n_sources, n_times)
+    galactic_b = SkyCoord(ra=np.atleast_1d(ra) * u.deg, dec=np.atleast_1d(dec) * u.deg, frame='icrs').galactic.b.deg
+    observable = ((alt >= min_alt)
+                  & (np.einsum('stk,tk->st', sources, sun) <= np.cos(np.deg2rad(min_sun_distance)))
+                  & (np.abs(galactic_b) > band)[:, None])
+
+    # Inside the beam of every pointing, calculated in chunks of pointings to limit the memory
+    pointings = _unit_vectors(pointings[:, 0], pointings[:, 1])              # (n_pointings, 3)
+    cos_radius = np.float32(np.cos(np.deg2rad(fov / 2)))
+    chunk = max(1, max_elements // max(1, alt.size))
+
+    mask = np.empty((len(pointings),) + alt.shape, dtype=bool)
+    for start in range(0, len(pointings), chunk):
+        in_beam = np.einsum('pk,stk->pst', pointings[start:start + chunk], sources) >= cos_radius
+        mask[start:start + chunk] = in_beam & observable
+    return mask
+
+
+'''
+_runs
+This function finds the runs of True values along the last axis of a boolean array.
+Outputs:
+    index: Tuple with the indices of the leading axes of every run
+    start, stop: NumPy arrays with the first index and one past the last index of every run
+'''
+
+def _runs(mask):
+    padded = np.zeros(mask.shape[:-1] + (mask.shape[-1] + 2,), dtype=np.int8)
+    padded[..., 1:-1] = mask
+    edges = np.diff(padded, axis=-1)
+    *index, start = np.nonzero(edges == 1)
+    stop = np.nonzero(edges == -1)[-1]
+    return tuple(index), start, stop
+
+
+'''
+observation_windows
+This function lists every period in which a source can be observed continuously with one pointing.
+The windows are ranked by flux and then by duration.
+Inputs:
+    mask: Boolean NumPy array of shape (n_pointings, n_sources, n_times) (see visibility_mask)
+    times: Astropy Time array in UTC of the time grid used for the mask
+    pointings: NumPy array of shape (n_pointings, 2) with the (altitude, azimuth) of the pointings in degrees
+    names: Names of the sources
+    flux: Flux of the sources in Jy
+Outputs:
+    windows: Pandas DataFrame with one row per window and the start and end in local time
+'''
+
+def observation_windows(mask, times, pointings, names, flux):
+    (pointing, source), start, stop = _runs(mask)
+    local = (times + utc_offset).datetime64
+    step = np.median(np.diff(local)) if len(local) > 1 else np.timedelta64(0, 's')
+
+    windows = pd.DataFrame({'Object Name': np.asarray(names)[source],
+                            'Flux (Jy)': np.asarray(flux)[source],
+                            'Alt center': pointings[pointing, 0],
+                            'Az center': pointings[pointing, 1],
+                            'Start': local[start],
+                            'End': local[stop - 1],
+                            'Duration (min)': (stop - start) * (step / np.timedelta64(1, 'm'))})
+    return windows.sort_values(['Flux (Jy)', 'Duration (min)'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+'''
+best_pointing_schedule
+This function chooses for every time step the pointing with the largest total flux inside the beam,
+and merges consecutive time steps with the same pointing into one block. Time steps without any source in the
+beam of any pointing are left out of the schedule.
+Inputs:
+    mask: Boolean NumPy array of shape (n_pointings, n_sources, n_times) (see visibility_mask)
+    times: Astropy Time array in UTC of the time grid used for the mask
+    pointings: NumPy array of shape (n_pointings, 2) with the (altitude, azimuth) of the pointings in degrees
+    flux: Flux of the sources in Jy
+Outputs:
+    schedule: Pandas DataFrame with one row per block, with the pointing, the start and end in local time,
+              the total flux in the beam and the number of sources in the beam
+'''
+
+def best_pointing_schedule(mask, times, pointings, flux):
+    total_flux = np.einsum('pst,s->pt', mask, np.asarray(flux, dtype=np.float64))     # (n_pointings, n_times)
+    best = np.argmax(total_flux, axis=0)
+    best_flux = total_flux[best, np.arange(len(best))]
+    n_sources = mask[best, :, np.arange(len(best))].sum(axis=-1)
+    best = np.where(best_flux > 0, best, -1)                # -1 for the time steps without a source in the beam
+
+    # Start a new block whenever the best pointing changes, then drop the blocks without a source in the beam
+    starts = np.flatnonzero(np.concatenate(([True], best[1:] != best[:-1])))
+    stops = np.append(starts[1:], len(best))
+    best_flux = np.maximum.reduceat(best_flux, starts) if len(best) else best_flux
+    n_sources = np.maximum.reduceat(n_sources, starts) if len(best) else n_sources
+    observed = best[starts] >= 0
+    starts, stops, best_flux, n_sources = starts[observed], stops[observed], best_flux[observed], n_sources[observed]
+    local = (times + utc_offset).datetime64
+
+    return pd.DataFrame({'Alt center': pointings[best[starts], 0],
+                         'Az center': pointings[best[starts], 1],
+                         'Start': local[starts],
+                         'End': local[stops - 1],
+                         'Flux in beam (Jy)': best_flux,
+                         'Sources in beam': n_sources})
+
+
+'''
+plan_observations
+This function plans the observations of all sources of a catalog that are brighter than a flux threshold.
+Inputs:
+    catalog: Catalog with the sources (see catalog.load_catalog)
+    start: Local start time of the plan (e.g. "2024-11-01T00:00:00")
+    stop: Local end time of the plan (e.g. "2024-11-15T00:00:00")
+    step: Time between two grid points (default: 10 minutes)
+    pointings: NumPy array of shape (n_pointings, 2) with candidate pointings (default: pointing_grid())
+    threshold: Minimal flux of the sources in Jy (default: 11)
+    The remaining inputs are passed to visibility_mask.
+Outputs:
+    windows: Ranked observation windows (see observation_windows)
+    schedule: Best pointing for every time step (see best_pointing_schedule)
+'''
+
+def plan_observations(catalog, start, stop, step=10 * u.min, pointings=None, threshold=min_flux, fov=fov,
+                      min_alt=min_altitude, min_sun_distance=sun_distance, band=galactic_band, location=site):
+    pointings = pointing_grid() if pointings is None else np.asarray(pointings, dtype=np.float64)
+    times = time_grid(start, stop, step)
+
+    catalog = catalog.brighter_than(threshold)
+    mask = visibility_mask(catalog.ra, catalog.dec, times, pointings, fov, min_alt, min_sun_distance, band, location)
+    return (observation_windows(mask, times, pointings, catalog.name, catalog.flux),
+            best_pointing_schedule(mask, times, pointings, catalog.flux))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planning observations of bright sources with the tilted array",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("start", type=str, help="Local start time, e.g. 2024-11-01T00:00:00")
+    parser.add_argument("stop", type=str, help="Local end time, e.g. 2024-11-15T00:00:00")
+    parser.add_argument("-c", "--catalog", type=str, default=catalog_file, help="NED table")
+    parser.add_argument("-s", "--step", type=float, default=10, help="Time step in minutes")
+    parser.add_argument("-f", "--flux", type=float, default=min_flux, help="Minimal flux of the sources in Jy")
+    parser.add_argument("--fov", type=float, default=fov, help="Field of view in degrees")
+    parser.add_argument("--min-alt", type=float, default=min_altitude, help="Minimal altitude in degrees")
+    parser.add_argument("--sun", type=float, default=sun_distance, help="Minimal distance to the Sun in degrees")
+    parser.add_argument("--band", type=float, default=galactic_band, help="Half width of the galactic band in degrees")
+    parser.add_argument("-n", "--top", type=int, default=20, help="Number of windows to print")
+    parser.add_argument("-o", "--output", type=str, default=None, help="CSV file for all windows")
+    args = parser.parse_args()
+
+    windows, schedule = plan_observations(load_catalog(args.catalog), args.start, args.stop, step=args.step * u.min,
+                                          threshold=args.flux, fov=args.fov, min_alt=args.min_alt,
+                                          min_sun_distance=args.sun, band=args.band)
+
+    print(windows.head(args.top).to_string())
+    print()
+    print(schedule.to_string())
+    if args.output is not None:
+        windows.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
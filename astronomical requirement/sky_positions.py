@@ -0,0 +1,119 @@
+# This script calculates the altitude and azimuth of many sources at many times at once.
+# Instead of building a new EarthLocation, SkyCoord and AltAz frame for every source and every time,
+# the whole catalog is transformed for a whole time grid in one broadcast transformation.
+# Sun and Moon positions are cached per time grid, so they are only calculated once for repeated plots.
+
+# Importing all the necessary modules and packages
+import os
+import importlib.util
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import EarthLocation, AltAz, SkyCoord, get_body
+
+# Settings of the station shared by all folders; Configuration/station.py only depends on NumPy and is loaded by
+# its path, so sys.path is not changed
+_station_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Configuration', 'station.py')
+_spec = importlib.util.spec_from_file_location('station', _station_file)
+station = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(station)
+
+# Observer's location (latitude, longitude, height)
+site = EarthLocation(lat=station.site_latitude * u.deg, lon=station.site_longitude * u.deg,
+                     height=station.site_height * u.m)
+utc_offset = 1 * u.hour             # Local time (CET) is one hour ahead of UTC
+
+# Cache of Sun and Moon positions per time grid
+_body_cache = {}
+
+
+'''
+time_grid
+This function creates an evenly spaced grid of observation times, e.g. a full night at one-minute resolution.
+Like the plots in Plot_sources_position.ipynb, the start and stop are given in local time.
+Inputs:
+    start: Local start time (e.g. "2024-11-01T18:00:00")
+    stop: Local end time (e.g. "2024-11-02T07:00:00")
+    step: Time between two grid points (default: 1 minute)
+Outputs:
+    times: Astropy Time array in UTC
+'''
+
+def time_grid(start, stop, step=1 * u.min):
+    start, stop = Time(start) - utc_offset, Time(stop) - utc_offset
+    n_steps = int(np.floor(((stop - start) / step).to_value(u.dimensionless_unscaled))) + 1
+    return start + np.arange(n_steps) * step
+
+
+'''
+_as_time
+This function converts a single time or a list of times to an Astropy Time array.
+Local time strings are converted to UTC like in the notebook; Time objects are used as they are.
+'''
+
+def _as_time(times):
+    if isinstance(times, Time):
+        return times if times.shape else times.reshape(1)
+    return Time(np.atleast_1d(times)) - utc_offset
+
+
+'''
+altaz_grid
+This function calculates the altitude and azimuth of every source at every time in one transformation.
+Inputs:
+    ra: Right ascension of the sources in degrees (array of length n_sources)
+    dec: Declination of the sources in degrees (array of length n_sources)
+    times: Astropy Time array in UTC (e.g. from time_grid), or local time string(s)
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    alt: NumPy array of shape (n_sources, n_times) with the altitude in degrees
+    az: NumPy array of shape (n_sources, n_times) with the azimuth in degrees
+'''
+
+def altaz_grid(ra, dec, times, location=site):
+    times = _as_time(times)
+    ra = np.atleast_1d(np.asarray(ra, dtype=np.float64))
+    dec = np.atleast_1d(np.asarray(dec, dtype=np.float64))
+
+    # Sources along the first axis and times along the second axis broadcast to (n_sources, n_times)
+    sky_coord = SkyCoord(ra=ra[:, None] * u.deg, dec=dec[:, None] * u.deg, frame='icrs')
+    altaz = sky_coord.transform_to(AltAz(obstime=times[None, :], location=location))
+
+    return altaz.alt.deg, altaz.az.deg
+
+
+'''
+catalog_altaz
+This function calculates the altitude and azimuth of all sources of a catalog table at all times.
+Inputs:
+    df: Pandas DataFrame with the columns 'RA' and 'DEC' in degrees (e.g. the NED table)
+    times: Astropy Time array in UTC (e.g. from time_grid), or local time string(s)
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    alt, az: NumPy arrays of shape (n_sources, n_times) in degrees (see altaz_grid)
+'''
+
+def catalog_altaz(df, times, location=site):
+    return altaz_grid(df['RA'].to_numpy(), df['DEC'].to_numpy(), times, location)
+
+
+'''
+sun_moon_altaz
+This function calculates the altitude and azimuth of the Sun and the Moon at every time of a time grid.
+The result is cached per time grid and location, so plotting several panels of the same night is cheap.
+Inputs:
+    times: Astropy Time array in UTC (e.g. from time_grid), or local time string(s)
+    location: Observer's location (default: the site in Leiden)
+Outputs:
+    positions: Dictionary {'Sun': (alt, az), 'Moon': (alt, az)} with NumPy arrays of length n_times in degrees
+'''
+
+def sun_moon_altaz(times, location=site):
+    times = _as_time(times)
+    key = (times.utc.jd1.tobytes(), times.utc.jd2.tobytes(), location.geodetic)
+    if key not in _body_cache:
+        frame = AltAz(obstime=times, location=location)
+        _body_cache[key] = {name: (altaz.alt.deg, altaz.az.deg)
+                            for name, altaz in ((name, get_body(name.lower(), times, location).transform_to(frame))
+                                                for name in ('Sun', 'Moon'))}
+    return _body_cache[key]